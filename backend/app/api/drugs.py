@@ -1,18 +1,54 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Depends, Request
 from typing import Dict
 from ..services.fda_service import FDAService
 from pydantic import BaseModel
-from typing import Optional
-import requests
+from typing import Optional, List, Tuple
+import aiohttp
+import asyncio
+import os
 from ..services.llm_service import analyze_drug_info
+from ..services.interaction_service import InteractionService
+from ..services.resilience import CircuitBreaker, LatencyTracker
+from ..services.cancellation import (
+    Deadline, DeadlineExceeded, RequestAbandoned, call_with_deadline, run_cancellable
+)
+from ..models.prescription import Medicine
+from .responses import ORJSONResponse, field_projection, project
+import logging
 
-router = APIRouter()
+logger = logging.getLogger(__name__)
+
+router = APIRouter(default_response_class=ORJSONResponse)
 fda_service = FDAService()
+interaction_service = InteractionService(fda_service)
+
+# Tail-latency controls for /search/{drug_name}
+LOOKUP_BUDGET = float(os.getenv("DRUG_LOOKUP_BUDGET_SECONDS", "20"))
+FDA_PROBE_TIMEOUT = 10
+HEDGE_ENABLED = os.getenv("DRUG_LOOKUP_HEDGE", "true").lower() in ("1", "true", "yes")
+HEDGE_PERCENTILE = float(os.getenv("DRUG_LOOKUP_HEDGE_PERCENTILE", "95"))
+HEDGE_DEFAULT_DELAY = float(os.getenv("DRUG_LOOKUP_HEDGE_DELAY_SECONDS", "3"))
+HEDGE_MIN_SAMPLES = 20
+
+fda_breaker = CircuitBreaker(
+    "fda",
+    failure_threshold=int(os.getenv("FDA_BREAKER_FAILURES", "5")),
+    cooldown=float(os.getenv("FDA_BREAKER_COOLDOWN_SECONDS", "30")),
+)
+llm_breaker = CircuitBreaker(
+    "llm",
+    failure_threshold=int(os.getenv("LLM_BREAKER_FAILURES", "3")),
+    cooldown=float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "30")),
+)
+fda_latency = LatencyTracker()
+lookup_stats = {"hedged": 0, "fda_wins": 0, "llm_wins": 0, "budget_exceeded": 0}
 
 class DrugSearchResponse(BaseModel):
     brand_name: Optional[str] = None
     generic_name: Optional[str] = None
     manufacturer: Optional[str] = None
+    product_type: Optional[str] = None
+    route: Optional[str] = None
     active_ingredients: Optional[str] = None
     purpose: Optional[str] = None
     warnings: Optional[str] = None
@@ -22,41 +58,214 @@ class DrugSearchResponse(BaseModel):
 class LLMSearchRequest(BaseModel):
     medicine_name: str
 
-@router.get("/search/{name}")
-async def search_drug(name: str) -> Dict:
-    """
-    Search for drug information by name
-    Returns comprehensive drug details from FDA database
-    """
-    drug_info = await fda_service.search_drug(name)
-    if "error" in drug_info:
-        raise HTTPException(status_code=404, detail=drug_info["error"])
-    return drug_info
+class InteractionCheckRequest(BaseModel):
+    medicines: List[Medicine]
 
 @router.get("/interactions/{name}")
-async def get_drug_interactions(name: str) -> Dict:
+async def get_drug_interactions(
+    name: str,
+    request: Request,
+    fields: Optional[List[str]] = Depends(field_projection)
+) -> Dict:
     """
     Get drug interactions and warnings
     """
-    interactions = await fda_service.get_drug_interactions(name)
+    deadline = Deadline(LOOKUP_BUDGET)
+    try:
+        interactions = await run_cancellable(
+            request, fda_service.get_drug_interactions(name, deadline), deadline, ["fda"]
+        )
+    except RequestAbandoned as e:
+        raise HTTPException(status_code=499, detail=str(e))
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
     if "error" in interactions:
         raise HTTPException(status_code=404, detail=interactions["error"])
-    return interactions
+    return project(interactions, fields)
+
+@router.post("/interactions")
+async def check_prescription_interactions(
+    request: InteractionCheckRequest,
+    http_request: Request,
+    fields: Optional[List[str]] = Depends(field_projection)
+) -> Dict:
+    """
+    Check every pair of medicines in a prescription for interactions.
+    Accepts the `medicines` list of PrescriptionData and returns a
+    pairwise interaction matrix with the label text backing each hit.
+    """
+    names = [medicine.name for medicine in request.medicines if medicine.name.strip()]
+    if len(names) < 2:
+        raise HTTPException(status_code=400, detail="At least two medicines are required")
+    deadline = Deadline(LOOKUP_BUDGET)
+    try:
+        result = await run_cancellable(
+            http_request, interaction_service.check_prescription(names, deadline), deadline, ["fda"]
+        )
+    except RequestAbandoned as e:
+        raise HTTPException(status_code=499, detail=str(e))
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    return project(result, fields)
 
 @router.get("/adverse-events/{name}")
-async def get_adverse_events(name: str, limit: int = 10) -> Dict:
+async def get_adverse_events(
+    name: str,
+    request: Request,
+    limit: int = 10,
+    fields: Optional[List[str]] = Depends(field_projection)
+) -> Dict:
     """
     Get reported adverse events for a drug
     """
-    events = await fda_service.get_adverse_events(name, limit)
+    deadline = Deadline(LOOKUP_BUDGET)
+    try:
+        events = await run_cancellable(
+            request, fda_service.get_adverse_events(name, limit, deadline), deadline, ["fda"]
+        )
+    except RequestAbandoned as e:
+        raise HTTPException(status_code=499, detail=str(e))
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
     if "error" in events:
         raise HTTPException(status_code=404, detail=events["error"])
-    return events
+    return project(events, fields)
+
+async def _probe_label(session: aiohttp.ClientSession, search: str) -> Tuple[int, Optional[Dict]]:
+    async with session.get(f"{FDAService.BASE_URL}/label.json", params={"search": search, "limit": 1}) as response:
+        if response.status != 200:
+            return response.status, None
+        return response.status, await response.json()
+
+async def _probe_fda(name_variations: List[str], deadline: Deadline) -> Optional[Dict]:
+    """
+    Try each name variation against each FDA search pattern until one
+    returns a label. Gives up when the deadline passes or the FDA breaker
+    opens; returns None if nothing was found. The probes share one aiohttp
+    session, so cancelling this coroutine closes the open connection.
+    """
+    search_patterns = [
+        'openfda.brand_name:"{name}"',
+        'openfda.generic_name:"{name}"',
+        'openfda.substance_name:"{name}"',
+        'openfda.product_ndc:"{name}"'
+    ]
+
+    timeout = aiohttp.ClientTimeout(total=FDA_PROBE_TIMEOUT)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        for name_var in name_variations:
+            for pattern in search_patterns:
+                if deadline.expired or not fda_breaker.allow():
+                    return None
+                try:
+                    status, data = await call_with_deadline(
+                        _probe_label(session, pattern.format(name=name_var)), deadline, "fda"
+                    )
+                except DeadlineExceeded:
+                    fda_breaker.release()
+                    return None
+                except asyncio.CancelledError:
+                    fda_breaker.release()
+                    raise
+                except Exception as e:
+                    # Connection errors, timeouts and malformed bodies alike, so a
+                    # half-open trial always ends with a verdict
+                    logger.warning("FDA probe failed: %s", e)
+                    fda_breaker.record_failure()
+                    continue
+
+                if status == 429 or status >= 500:
+                    fda_breaker.record_failure()
+                    continue
+                fda_breaker.record_success()
+
+                if data and data.get('results'):
+                    return fda_service.format_drug_info(data['results'][0])
+    return None
+
+async def _llm_lookup(drug_name: str, deadline: Deadline) -> Dict:
+    """Gemini fallback, guarded by the LLM breaker"""
+    if not llm_breaker.allow():
+        raise Exception("LLM circuit breaker is open")
+    try:
+        drug_info = await analyze_drug_info(drug_name, deadline)
+    except asyncio.CancelledError:
+        llm_breaker.release()
+        raise
+    except Exception:
+        llm_breaker.record_failure()
+        raise
+    llm_breaker.record_success()
+    return drug_info
+
+def _hedge_delay() -> float:
+    """Latency after which the FDA path is considered slow"""
+    if len(fda_latency.samples) < HEDGE_MIN_SAMPLES:
+        return HEDGE_DEFAULT_DELAY
+    return fda_latency.percentile(HEDGE_PERCENTILE)
+
+async def _race_lookup(drug_name: str, name_variations: List[str], deadline: Deadline) -> Dict:
+    """
+    Run the FDA probes and, when hedging, start the LLM fallback once the
+    FDA path is slower than its usual percentile latency. The first usable
+    answer wins and the other task is cancelled.
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    fda_task = asyncio.create_task(_probe_fda(name_variations, deadline))
+    llm_task = None
+    llm_error = None
+
+    try:
+        if HEDGE_ENABLED:
+            await asyncio.wait({fda_task}, timeout=min(_hedge_delay(), deadline.remaining()))
+            if not fda_task.done():
+                lookup_stats["hedged"] += 1
+                llm_task = asyncio.create_task(_llm_lookup(drug_name, deadline))
+
+        pending = {task for task in (fda_task, llm_task) if task is not None}
+        while pending:
+            remaining = deadline.remaining()
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task is fda_task:
+                    result = None if task.exception() else task.result()
+                    if result:
+                        fda_latency.record(loop.time() - started)
+                        if llm_task is not None:
+                            lookup_stats["fda_wins"] += 1
+                        return result
+                    if llm_task is None:
+                        llm_task = asyncio.create_task(_llm_lookup(drug_name, deadline))
+                        pending.add(llm_task)
+                elif task.exception() is None:
+                    if not fda_task.done():
+                        lookup_stats["llm_wins"] += 1
+                    return task.result()
+                else:
+                    llm_error = task.exception()
+
+        if llm_error is not None:
+            logger.warning("LLM fallback error: %s", llm_error)
+            raise HTTPException(status_code=404, detail="Drug not found in FDA database and LLM service failed")
+        raise DeadlineExceeded("Drug lookup exceeded its latency budget")
+    finally:
+        for task in (fda_task, llm_task):
+            if task is not None and not task.done():
+                task.cancel()
 
 @router.get("/search/{drug_name}", response_model=DrugSearchResponse)
-async def search_drug(drug_name: str):
+async def search_drug(
+    drug_name: str,
+    request: Request,
+    budget: Optional[float] = Query(None, gt=0, description="Latency budget in seconds"),
+    fields: Optional[List[str]] = Depends(field_projection)
+):
     """
-    Search for drug information using FDA API
+    Search for drug information by name: the offline label index first,
+    then the FDA API raced against the LLM fallback within the budget
     """
     try:
         # Clean and prepare the drug name for search
@@ -71,69 +280,71 @@ async def search_drug(drug_name: str):
             cleaned_name.split('-')[0],  # First part before hyphen
             cleaned_name.split()[0] + ' ' + cleaned_name.split()[-1] if len(cleaned_name.split()) > 1 else cleaned_name  # First and last word
         ]
-        
-        # Try different search patterns for each name variation
-        search_patterns = [
-            f"brand_name:{name}",
-            f"generic_name:{name}",
-            f"substance_name:{name}",
-            f"product_ndc:{name}"
-        ]
-        
-        for name_var in name_variations:
-            for pattern in search_patterns:
-                try:
-                    response = requests.get(
-                        f"https://api.fda.gov/drug/label.json?search={pattern.format(name=name_var)}&limit=1",
-                        timeout=10
-                    )
-                    
-                    if response.status_code == 200:
-                        data = response.json()
-                        if data.get('results'):
-                            drug = data['results'][0]
-                            return {
-                                "brand_name": drug.get('brand_name', [''])[0] if drug.get('brand_name') else None,
-                                "generic_name": drug.get('generic_name', [''])[0] if drug.get('generic_name') else None,
-                                "manufacturer": drug.get('manufacturer_name', [''])[0] if drug.get('manufacturer_name') else None,
-                                "active_ingredients": drug.get('active_ingredient', [''])[0] if drug.get('active_ingredient') else None,
-                                "purpose": drug.get('purpose', [''])[0] if drug.get('purpose') else None,
-                                "warnings": drug.get('warnings', [''])[0] if drug.get('warnings') else None,
-                                "dosage_administration": drug.get('dosage_and_administration', [''])[0] if drug.get('dosage_and_administration') else None,
-                                "pregnancy_risk": drug.get('pregnancy', [''])[0] if drug.get('pregnancy') else None
-                            }
-                except requests.exceptions.RequestException:
-                    continue
-        
-        # If no results found with any pattern, try the LLM service
-        try:
-            drug_info = await analyze_drug_info(drug_name)
-            return drug_info
-        except Exception as llm_error:
-            print(f"LLM fallback error: {str(llm_error)}")
-            raise HTTPException(status_code=404, detail="Drug not found in FDA database and LLM service failed")
-            
-    except requests.exceptions.RequestException as e:
-        print(f"FDA API request error: {str(e)}")
-        # If FDA API fails, try the LLM service
-        try:
-            drug_info = await analyze_drug_info(drug_name)
-            return drug_info
-        except Exception as llm_error:
-            print(f"LLM fallback error: {str(llm_error)}")
-            raise HTTPException(status_code=500, detail="Failed to fetch drug information")
+
+        # The offline label index answers all variations in milliseconds
+        if fda_service.index is not None:
+            for name_var in name_variations:
+                drug_info = fda_service.search_local(name_var)
+                if drug_info:
+                    return project(drug_info, fields)
+
+        if fda_service.offline_only:
+            name_variations = []
+
+        # Cancel the probes and the LLM fallback if the client goes away
+        deadline = Deadline(min(budget or LOOKUP_BUDGET, LOOKUP_BUDGET))
+        drug_info = await run_cancellable(
+            request, _race_lookup(drug_name, name_variations, deadline), deadline, ["fda", "llm"]
+        )
+        return project(drug_info, fields)
+
+    except HTTPException:
+        raise
+    except RequestAbandoned as e:
+        raise HTTPException(status_code=499, detail=str(e))
+    except DeadlineExceeded:
+        lookup_stats["budget_exceeded"] += 1
+        raise HTTPException(status_code=504, detail="Drug lookup exceeded its latency budget")
     except Exception as e:
-        print(f"Unexpected error: {str(e)}")
+        logger.exception("Unexpected error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/lookup-stats")
+async def get_lookup_stats() -> Dict:
+    """
+    Circuit breaker state and hedging counters of the drug lookup path
+    """
+    return {
+        "breakers": {
+            fda_breaker.name: fda_breaker.snapshot(),
+            llm_breaker.name: llm_breaker.snapshot(),
+        },
+        "hedging": {
+            "enabled": HEDGE_ENABLED,
+            "delay_seconds": _hedge_delay(),
+            **lookup_stats,
+        },
+    }
+
 @router.post("/llm-search", response_model=DrugSearchResponse)
-async def llm_search(request: LLMSearchRequest):
+async def llm_search(
+    request: LLMSearchRequest,
+    http_request: Request,
+    fields: Optional[List[str]] = Depends(field_projection)
+):
     """
     Search for drug information using LLM when FDA API fails
     """
+    deadline = Deadline(LOOKUP_BUDGET)
     try:
         # Use LLM to analyze drug information
-        drug_info = await analyze_drug_info(request.medicine_name)
-        return drug_info
+        drug_info = await run_cancellable(
+            http_request, analyze_drug_info(request.medicine_name, deadline), deadline, ["llm"]
+        )
+        return project(drug_info, fields)
+    except RequestAbandoned as e:
+        raise HTTPException(status_code=499, detail=str(e))
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
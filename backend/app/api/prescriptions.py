@@ -1,31 +1,47 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Request
 from ..services.ocr_service import perform_ocr
 from ..services.llm_service import analyze_prescription
+from ..services.cancellation import Deadline, DeadlineExceeded, RequestAbandoned, run_cancellable
 from ..models.prescription import PrescriptionData
+from .responses import ORJSONResponse, field_projection, project
+from typing import List, Optional
 import base64
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
 
 @router.post("/process", response_model=PrescriptionData)
-async def process_prescription(file: UploadFile = File(...)) -> PrescriptionData:
+async def process_prescription(
+    request: Request,
+    file: UploadFile = File(...),
+    fields: Optional[List[str]] = Depends(field_projection)
+) -> PrescriptionData:
     """
     Process a prescription image:
     1. Perform OCR to extract text
     2. Analyze the text using LLM to extract structured data
+    Abandoned requests cancel the OCR/LLM calls still in flight.
     """
+    deadline = Deadline()
     try:
         # Read the image file
         image_data = await file.read()
         image_base64 = base64.b64encode(image_data).decode('utf-8')
         
-        # Perform OCR
-        text = await perform_ocr(image_base64)
-        if not text:
-            raise HTTPException(status_code=400, detail="Failed to extract text from image")
-            
-        # Analyze text with LLM
-        prescription_data = await analyze_prescription(text)
-        return prescription_data
+        async def process():
+            # Perform OCR
+            text = await perform_ocr(image_base64, deadline=deadline)
+            if not text:
+                raise HTTPException(status_code=400, detail="Failed to extract text from image")
+                
+            # Analyze text with LLM
+            return await analyze_prescription(text, deadline)
         
+        prescription_data = await run_cancellable(request, process(), deadline, ["ocr", "llm"])
+        return project(prescription_data, fields)
+        
+    except RequestAbandoned as e:
+        raise HTTPException(status_code=499, detail=str(e))
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
@@ -0,0 +1,36 @@
+from fastapi import Query
+from fastapi.responses import ORJSONResponse
+from typing import Any, List, Optional
+
+__all__ = ["ORJSONResponse", "field_projection", "project"]
+
+
+def field_projection(
+    fields: Optional[str] = Query(None, description="Comma-separated list of fields to return")
+) -> Optional[List[str]]:
+    """Parse the `?fields=` query parameter"""
+    if not fields:
+        return None
+    return [field.strip() for field in fields.split(",") if field.strip()]
+
+
+def _project_item(item: Any, fields: List[str]) -> Any:
+    if not isinstance(item, dict):
+        return item
+    return {field: item[field] for field in fields if field in item}
+
+
+def project(data: Any, fields: Optional[List[str]]) -> Any:
+    """
+    Keep only the requested top-level fields of a dict (or of every dict in
+    a list). Without a projection the data is returned unchanged; with one,
+    a ready ORJSONResponse is returned so a route's response_model does not
+    fill the dropped fields back in with nulls.
+    """
+    if fields is None:
+        return data
+    if isinstance(data, list):
+        content = [_project_item(item, fields) for item in data]
+    else:
+        content = _project_item(data, fields)
+    return ORJSONResponse(content=content)
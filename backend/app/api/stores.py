@@ -1,28 +1,30 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Depends
 from typing import List, Dict, Optional
 from ..services.store_service import StoreService
+from .responses import ORJSONResponse, field_projection, project
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
 store_service = StoreService()
 
 @router.get("/search")
 async def search_stores(
     postal_code: Optional[str] = Query(None, description="Postal code to search for"),
     state: Optional[str] = Query(None, description="State to filter by"),
-    district: Optional[str] = Query(None, description="District to filter by")
+    district: Optional[str] = Query(None, description="District to filter by"),
+    fields: Optional[List[str]] = Depends(field_projection)
 ) -> List[Dict]:
     """
     Search for stores based on postal code, state, and district.
     Returns up to 10 matching stores.
     """
-    return store_service.search_stores(postal_code, state, district)
+    return project(store_service.search_stores(postal_code, state, district), fields)
 
 @router.get("/{kendra_code}")
-async def get_store_details(kendra_code: str) -> Dict:
+async def get_store_details(kendra_code: str, fields: Optional[List[str]] = Depends(field_projection)) -> Dict:
     """
     Get detailed information for a specific store by its kendra code
     """
     store = store_service.get_store_details(kendra_code)
     if not store:
         raise HTTPException(status_code=404, detail="Store not found")
-    return store 
\ No newline at end of file
+    return project(store, fields) 
\ No newline at end of file
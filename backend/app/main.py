@@ -1,11 +1,23 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
 import base64
-from .services.ocr_service import perform_ocr
+import os
+from typing import List, Optional
+from .services.ocr_service import perform_ocr, ocr_engine, ocr_stats
 from .services.llm_service import analyze_prescription
+from .services.cancellation import (
+    Deadline, DeadlineExceeded, RequestAbandoned, cancellation_stats, run_cancellable
+)
 from .api.stores import router as stores_router
 from .api.drugs import router as drugs_router
 from .api.pdf import router as pdf_router
+from .api.prescriptions import router as prescriptions_router
+from .api.responses import ORJSONResponse, field_projection, project
+from .middleware.compression import CompressionMiddleware
+from .middleware.request_id import RequestIdMiddleware
+from .logging_config import setup_logging
+
+setup_logging()
 
 app = FastAPI(title="RX Manager Demo")
 
@@ -18,18 +30,37 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large JSON payloads (drug labels run to tens of KB)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "1024")),
+    brotli_quality=int(os.getenv("RESPONSE_BROTLI_QUALITY", "7")),
+)
+
+# Added last so it wraps everything and tags all log records of a request
+app.add_middleware(RequestIdMiddleware)
+
 # Include routers
 app.include_router(stores_router, prefix="/api/stores", tags=["stores"])
 app.include_router(drugs_router, prefix="/api/drugs", tags=["drugs"])
 app.include_router(pdf_router, prefix="/api", tags=["pdf"])
+app.include_router(prescriptions_router, prefix="/api/prescriptions", tags=["prescriptions"])
 
-@app.post("/api/analyze-prescription")
-async def analyze_prescription_image(file: UploadFile = File(...)):
+@app.post("/api/analyze-prescription", response_class=ORJSONResponse)
+async def analyze_prescription_image(
+    request: Request,
+    file: UploadFile = File(...),
+    fields: Optional[List[str]] = Depends(field_projection)
+):
     """
     Process a prescription image or PDF:
     1. Extract text using OCR or PDF text extraction
     2. Analyze text using Gemini Pro
+
+    Work still in flight is cancelled when the client disconnects or the
+    request deadline passes.
     """
+    deadline = Deadline()
     try:
         # Read and encode file
         file_data = await file.read()
@@ -38,18 +69,36 @@ async def analyze_prescription_image(file: UploadFile = File(...)):
         # Determine file type
         is_pdf = file.content_type == 'application/pdf'
         
-        # Extract text
-        text = await perform_ocr(file_base64, is_pdf)
-        if not text:
-            raise HTTPException(status_code=400, detail="Could not extract text from file")
-            
-        # Analyze with LLM
-        result = await analyze_prescription(text)
-        return result
+        async def process():
+            # Extract text
+            text = await perform_ocr(file_base64, is_pdf, deadline)
+            if not text:
+                raise HTTPException(status_code=400, detail="Could not extract text from file")
+                
+            # Analyze with LLM
+            return await analyze_prescription(text, deadline)
+        
+        stages = ["llm"] if is_pdf else ["ocr", "llm"]
+        result = await run_cancellable(request, process(), deadline, stages)
+        return project(result, fields)
         
+    except RequestAbandoned as e:
+        raise HTTPException(status_code=499, detail=str(e))
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/cancellation-stats")
+async def get_cancellation_stats():
+    """Upstream OCR/LLM/FDA work saved by cancelling abandoned requests"""
+    return cancellation_stats.snapshot()
+
+@app.get("/api/ocr-stats")
+async def get_ocr_stats():
+    """Images handled by each OCR engine and escalations from local OCR to Vision"""
+    return {"engine": ocr_engine.name, **ocr_stats}
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
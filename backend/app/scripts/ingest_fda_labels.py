@@ -0,0 +1,82 @@
+"""
+Build or refresh the offline openFDA drug label index.
+
+Usage:
+    python -m app.scripts.ingest_fda_labels --db data/fda_labels.db drug-label-0001-of-0012.json.zip ...
+    python -m app.scripts.ingest_fda_labels --db data/fda_labels.db --refresh
+
+With --refresh the openFDA download manifest is fetched and only partitions
+from a release that has not been ingested yet are downloaded.
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import urllib.request
+from dotenv import load_dotenv
+
+from ..services.fda_index import FDALabelIndex
+
+load_dotenv()
+
+MANIFEST_URL = "https://api.fda.gov/download.json"
+
+
+def refresh_from_manifest(index: FDALabelIndex, manifest_url: str = MANIFEST_URL) -> int:
+    """Download and ingest every drug label partition of a new release"""
+    with urllib.request.urlopen(manifest_url, timeout=60) as response:
+        manifest = json.load(response)
+
+    label = manifest["results"]["drug"]["label"]
+    export_date = label.get("export_date")
+    total = 0
+
+    for partition in label.get("partitions", []):
+        url = partition["file"]
+        if index.is_ingested(url, export_date):
+            print(f"Skipping {url}: release {export_date} already ingested")
+            continue
+
+        # Stream the partition to disk rather than holding it in memory
+        fd, tmp_path = tempfile.mkstemp(suffix=".json.zip")
+        try:
+            with os.fdopen(fd, "wb") as out, urllib.request.urlopen(url, timeout=300) as response:
+                shutil.copyfileobj(response, out, length=1 << 20)
+            count = index.ingest_file(tmp_path, source=url, last_updated=export_date)
+            total += count
+            print(f"Ingested {count} labels from {url}")
+        finally:
+            os.remove(tmp_path)
+
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest openFDA drug label bulk files into a local index")
+    parser.add_argument("files", nargs="*", help="Bulk label files (.json or .json.zip)")
+    parser.add_argument("--db", default=os.getenv("FDA_LABEL_INDEX", "fda_labels.db"),
+                        help="Path of the SQLite index (default: $FDA_LABEL_INDEX)")
+    parser.add_argument("--refresh", action="store_true",
+                        help="Download new partitions listed in the openFDA manifest")
+    parser.add_argument("--manifest-url", default=MANIFEST_URL)
+    args = parser.parse_args()
+
+    if not args.files and not args.refresh:
+        parser.error("pass bulk files to ingest or --refresh")
+
+    index = FDALabelIndex(args.db)
+    try:
+        for path in args.files:
+            count = index.ingest_file(path)
+            print(f"Ingested {count} labels from {path}")
+        if args.refresh:
+            refresh_from_manifest(index, args.manifest_url)
+        stats = index.stats()
+        print(f"Index {args.db} now holds {stats['labels']} labels")
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
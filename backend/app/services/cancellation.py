@@ -0,0 +1,144 @@
+import asyncio
+import logging
+import os
+import time
+from collections import Counter
+from typing import Awaitable, Dict, List, Optional, TypeVar
+from starlette.requests import Request
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+DEFAULT_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "60"))
+DISCONNECT_POLL_SECONDS = 0.25
+
+
+class DeadlineExceeded(Exception):
+    """The end-to-end deadline of a request passed"""
+
+
+class RequestAbandoned(Exception):
+    """The client disconnected before the response was ready"""
+
+
+class Deadline:
+    """
+    End-to-end deadline of one request, passed down to every upstream call.
+    Also tracks which upstream stages have started and which are in flight,
+    so abandoned work can be accounted for.
+    """
+
+    def __init__(self, seconds: Optional[float] = None):
+        self.seconds = seconds if seconds is not None else DEFAULT_DEADLINE_SECONDS
+        self.expires_at = time.monotonic() + self.seconds
+        self.started = set()
+        self.in_flight: Counter = Counter()
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def check(self, stage: str):
+        if self.expired:
+            raise DeadlineExceeded(f"Deadline of {self.seconds:g}s exceeded before {stage} finished")
+
+
+class CancellationStats:
+    """Counters of work cancelled or skipped because nobody would read the result"""
+
+    def __init__(self):
+        self.abandoned: Counter = Counter()
+        self.cancelled: Counter = Counter()
+        self.skipped: Counter = Counter()
+
+    def record_abandoned(self, reason: str, deadline: Deadline, stages: List[str]):
+        self.abandoned[reason] += 1
+        # Calls cut off by the deadline count themselves in call_with_deadline
+        if reason == "disconnect":
+            for stage, count in deadline.in_flight.items():
+                self.cancelled[stage] += count
+        for stage in stages:
+            if stage not in deadline.started:
+                self.skipped[stage] += 1
+
+    def snapshot(self) -> Dict:
+        return {
+            "requests_abandoned": dict(self.abandoned),
+            "upstream_calls_cancelled": dict(self.cancelled),
+            "upstream_calls_skipped": dict(self.skipped),
+        }
+
+
+cancellation_stats = CancellationStats()
+
+
+async def call_with_deadline(call: Awaitable[T], deadline: Optional[Deadline], stage: str) -> T:
+    """Await an upstream call, cancelling it if the deadline passes first"""
+    if deadline is None:
+        return await call
+
+    deadline.started.add(stage)
+    deadline.in_flight[stage] += 1
+    try:
+        return await asyncio.wait_for(call, timeout=deadline.remaining())
+    except asyncio.TimeoutError:
+        if not deadline.expired:
+            raise  # the call's own timeout, not the deadline
+        cancellation_stats.cancelled[stage] += 1
+        raise DeadlineExceeded(f"Deadline of {deadline.seconds:g}s exceeded during {stage}")
+    except asyncio.CancelledError:
+        # Cancelled by a caller enforcing the same deadline
+        if deadline.expired:
+            cancellation_stats.cancelled[stage] += 1
+        raise
+    finally:
+        deadline.in_flight[stage] -= 1
+        if deadline.in_flight[stage] <= 0:
+            del deadline.in_flight[stage]
+
+
+async def run_cancellable(request: Request, work: Awaitable[T], deadline: Deadline,
+                          stages: Optional[List[str]] = None) -> T:
+    """
+    Run a request's work while watching for the client going away or the
+    deadline passing. In either case the pending upstream calls are
+    cancelled straight away and the abandoned work is counted.
+
+    `stages` lists the upstream calls the work would make, in order, so
+    that calls which never started are counted as skipped.
+    """
+    stages = stages or []
+    task = asyncio.ensure_future(work)
+    reason = None
+    try:
+        while reason is None:
+            done, _ = await asyncio.wait({task}, timeout=min(DISCONNECT_POLL_SECONDS, deadline.remaining() or 0.01))
+            if done:
+                try:
+                    return task.result()
+                except DeadlineExceeded:
+                    reason = "deadline"
+                    raise
+            if await request.is_disconnected():
+                reason = "disconnect"
+            elif deadline.expired:
+                reason = "deadline"
+    finally:
+        if reason is not None:
+            cancellation_stats.record_abandoned(reason, deadline, stages)
+            logger.info("Abandoned request work", extra={
+                "reason": reason,
+                "in_flight": sorted(deadline.in_flight),
+                "started": sorted(deadline.started),
+            })
+        if not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    if reason == "disconnect":
+        raise RequestAbandoned("Client disconnected")
+    raise DeadlineExceeded(f"Deadline of {deadline.seconds:g}s exceeded")
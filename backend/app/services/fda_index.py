@@ -0,0 +1,310 @@
+import json
+import os
+import sqlite3
+import threading
+import zipfile
+from contextlib import contextmanager
+from datetime import datetime
+from io import TextIOWrapper
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Label fields kept in the offline mirror. Everything else in the bulk
+# records (package_label_principal_display_panel, spl_*, ...) is dropped
+# to keep the index small.
+LABEL_FIELDS = [
+    "id",
+    "set_id",
+    "effective_time",
+    "openfda",
+    "active_ingredient",
+    "purpose",
+    "warnings",
+    "dosage_and_administration",
+    "pregnancy",
+    "drug_interactions",
+    "contraindications",
+    "boxed_warning",
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS labels (
+    rowid INTEGER PRIMARY KEY,
+    set_id TEXT UNIQUE NOT NULL,
+    effective_time TEXT,
+    brand_name TEXT,
+    generic_name TEXT,
+    substance_name TEXT,
+    product_ndc TEXT,
+    data TEXT NOT NULL
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS labels_fts USING fts5(
+    brand_name, generic_name, substance_name, product_ndc,
+    content='labels', content_rowid='rowid'
+);
+
+CREATE TRIGGER IF NOT EXISTS labels_ai AFTER INSERT ON labels BEGIN
+    INSERT INTO labels_fts(rowid, brand_name, generic_name, substance_name, product_ndc)
+    VALUES (new.rowid, new.brand_name, new.generic_name, new.substance_name, new.product_ndc);
+END;
+
+CREATE TRIGGER IF NOT EXISTS labels_ad AFTER DELETE ON labels BEGIN
+    INSERT INTO labels_fts(labels_fts, rowid, brand_name, generic_name, substance_name, product_ndc)
+    VALUES ('delete', old.rowid, old.brand_name, old.generic_name, old.substance_name, old.product_ndc);
+END;
+
+CREATE TRIGGER IF NOT EXISTS labels_au AFTER UPDATE ON labels BEGIN
+    INSERT INTO labels_fts(labels_fts, rowid, brand_name, generic_name, substance_name, product_ndc)
+    VALUES ('delete', old.rowid, old.brand_name, old.generic_name, old.substance_name, old.product_ndc);
+    INSERT INTO labels_fts(rowid, brand_name, generic_name, substance_name, product_ndc)
+    VALUES (new.rowid, new.brand_name, new.generic_name, new.substance_name, new.product_ndc);
+END;
+
+CREATE TABLE IF NOT EXISTS datasets (
+    source TEXT PRIMARY KEY,
+    last_updated TEXT,
+    records INTEGER,
+    ingested_at TEXT
+);
+"""
+
+UPSERT_SQL = """
+INSERT INTO labels (set_id, effective_time, brand_name, generic_name, substance_name, product_ndc, data)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(set_id) DO UPDATE SET
+    effective_time = excluded.effective_time,
+    brand_name = excluded.brand_name,
+    generic_name = excluded.generic_name,
+    substance_name = excluded.substance_name,
+    product_ndc = excluded.product_ndc,
+    data = excluded.data
+WHERE labels.effective_time IS NULL OR excluded.effective_time >= labels.effective_time
+"""
+
+
+class _JSONStream:
+    """Incremental reader over a text stream holding one large JSON document"""
+
+    def __init__(self, fp, chunk_size: int = 1 << 16):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.fp.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Skip whitespace and return the next character ('' at end of input)"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"Expected '{char}' at offset {self.pos} of JSON stream")
+        self.pos += 1
+
+    def decode(self):
+        """Decode the next complete JSON value, reading more input as needed"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # A value ending exactly at the buffer edge may be a truncated number
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            if not self._fill():
+                value, self.pos = self.decoder.raw_decode(self.buf, self.pos)
+                return value
+
+
+def iter_label_file(fp, chunk_size: int = 1 << 16) -> Iterator[Tuple[str, object]]:
+    """
+    Stream an openFDA bulk download ({"meta": {...}, "results": [...]})
+    without loading it into memory.
+
+    Yields ("meta", dict) once and ("result", dict) for every label record.
+    """
+    stream = _JSONStream(fp, chunk_size)
+    stream.expect("{")
+    while stream.peek() != "}":
+        key = stream.decode()
+        stream.expect(":")
+        if key == "results" and stream.peek() == "[":
+            stream.expect("[")
+            while stream.peek() != "]":
+                yield "result", stream.decode()
+                if stream.peek() == ",":
+                    stream.expect(",")
+            stream.expect("]")
+        else:
+            value = stream.decode()
+            if key == "meta":
+                yield "meta", value
+        if stream.peek() == ",":
+            stream.expect(",")
+
+
+@contextmanager
+def _open_label_file(path: str):
+    """Open a .json or a zipped .json.zip bulk file as a text stream"""
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            name = next(n for n in archive.namelist() if n.endswith(".json"))
+            with TextIOWrapper(archive.open(name), encoding="utf-8") as fp:
+                yield fp
+    else:
+        with open(path, "r", encoding="utf-8") as fp:
+            yield fp
+
+
+def _join(values) -> Optional[str]:
+    if not values:
+        return None
+    return "; ".join(str(v).strip().upper() for v in values)
+
+
+def _fts_phrase(text: str) -> str:
+    """Quote user input as a single FTS5 phrase"""
+    return '"' + text.replace('"', '""') + '"'
+
+
+class FDALabelIndex:
+    """Local SQLite/FTS5 mirror of the openFDA drug label dataset"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def is_ingested(self, source: str, last_updated: Optional[str]) -> bool:
+        """Check whether a dataset release has already been ingested"""
+        row = self.conn.execute(
+            "SELECT last_updated FROM datasets WHERE source = ?", (source,)
+        ).fetchone()
+        return row is not None and last_updated is not None and row["last_updated"] == last_updated
+
+    def ingest_file(self, path: str, source: Optional[str] = None,
+                    last_updated: Optional[str] = None, batch_size: int = 500) -> int:
+        """
+        Stream a bulk label file into the index.
+
+        Labels are upserted by set_id and only replaced by a version with a
+        newer (or equal) effective_time, so re-running on a new release is
+        an incremental refresh. Returns the number of records read.
+        """
+        source = source or os.path.basename(path)
+        count = 0
+        batch = []
+        with _open_label_file(path) as fp:
+            for kind, value in iter_label_file(fp):
+                if kind == "meta":
+                    last_updated = last_updated or value.get("last_updated")
+                    continue
+                row = self._label_row(value)
+                if row is None:
+                    continue
+                batch.append(row)
+                count += 1
+                if len(batch) >= batch_size:
+                    self._write(batch)
+                    batch = []
+        if batch:
+            self._write(batch)
+
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO datasets (source, last_updated, records, ingested_at) VALUES (?, ?, ?, ?)",
+                (source, last_updated, count, datetime.utcnow().isoformat()),
+            )
+        return count
+
+    def _write(self, rows: List[tuple]):
+        with self._lock, self.conn:
+            self.conn.executemany(UPSERT_SQL, rows)
+
+    def _label_row(self, label: Dict) -> Optional[tuple]:
+        set_id = label.get("set_id") or label.get("id")
+        if not set_id:
+            return None
+        openfda = label.get("openfda", {})
+        data = {k: label[k] for k in LABEL_FIELDS if k in label}
+        return (
+            set_id,
+            label.get("effective_time"),
+            _join(openfda.get("brand_name")),
+            _join(openfda.get("generic_name")),
+            _join(openfda.get("substance_name")),
+            _join(openfda.get("product_ndc")),
+            json.dumps(data, separators=(",", ":")),
+        )
+
+    def search(self, name: str, limit: int = 1) -> List[Dict]:
+        """
+        Full-text search over brand, generic and substance names and NDC.
+        Exact name matches rank first, then FTS5 bm25 relevance.
+        """
+        name = name.strip()
+        if not name:
+            return []
+        exact = name.upper()
+        with self._lock:
+            try:
+                rows = self.conn.execute(
+                    """
+                    SELECT labels.data FROM labels_fts
+                    JOIN labels ON labels.rowid = labels_fts.rowid
+                    WHERE labels_fts MATCH ?
+                    ORDER BY (labels.brand_name = ? OR labels.generic_name = ?
+                              OR labels.substance_name = ?) DESC,
+                             bm25(labels_fts), labels.effective_time DESC
+                    LIMIT ?
+                    """,
+                    (_fts_phrase(name), exact, exact, exact, limit),
+                ).fetchall()
+            except sqlite3.OperationalError:
+                return []
+        return [json.loads(row["data"]) for row in rows]
+
+    def get_label(self, name: str) -> Optional[Dict]:
+        """Best matching label for a drug name or NDC"""
+        results = self.search(name, limit=1)
+        return results[0] if results else None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            labels = self.conn.execute("SELECT COUNT(*) FROM labels").fetchone()[0]
+            datasets = [dict(r) for r in self.conn.execute("SELECT * FROM datasets ORDER BY source")]
+        return {"labels": labels, "datasets": datasets}
+
+
+def load_index_from_env() -> Optional[FDALabelIndex]:
+    """Open the offline label index configured by FDA_LABEL_INDEX, if present"""
+    path = os.getenv("FDA_LABEL_INDEX")
+    if not path or not os.path.exists(path):
+        return None
+    return FDALabelIndex(path)
@@ -1,123 +1,166 @@
 import aiohttp
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 import json
+import os
+from .fda_index import FDALabelIndex, load_index_from_env
+from .cancellation import Deadline, DeadlineExceeded, call_with_deadline
+import logging
+
+logger = logging.getLogger(__name__)
 
 class FDAService:
     """Service for interacting with FDA Drug APIs"""
     
     BASE_URL = "https://api.fda.gov/drug"
     
-    async def search_drug(self, name: str) -> Dict:
+    def __init__(self, index: Optional[FDALabelIndex] = None, offline_only: Optional[bool] = None):
+        """
+        Label lookups are answered from the offline index (see
+        app/scripts/ingest_fda_labels.py) when FDA_LABEL_INDEX points to one.
+        Misses fall back to api.fda.gov unless FDA_OFFLINE_ONLY is set.
+        """
+        self.index = index if index is not None else load_index_from_env()
+        if offline_only is None:
+            offline_only = os.getenv("FDA_OFFLINE_ONLY", "").lower() in ("1", "true", "yes")
+        self.offline_only = offline_only and self.index is not None
+    
+    def search_local(self, name: str) -> Optional[Dict]:
+        """Look up drug information in the offline label index"""
+        if self.index is None:
+            return None
+        label = self.index.get_label(name)
+        return self.format_drug_info(label) if label else None
+    
+    async def get_label(self, name: str, session: Optional[aiohttp.ClientSession] = None) -> Optional[Dict]:
         """
-        Search for drug information by name using FDA API
-        Returns drug details including active ingredients, usage, warnings etc.
+        Get the raw label record for a drug, from the offline index if
+        available, otherwise from the FDA API. Pass a shared session to
+        issue many lookups concurrently.
         """
+        if self.index is not None:
+            label = self.index.get_label(name)
+            if label or self.offline_only:
+                return label
+
+        if session is None:
+            async with aiohttp.ClientSession() as own_session:
+                return await self.get_label(name, own_session)
+
         try:
+            url = f"{self.BASE_URL}/label.json"
+            params = {
+                'search': f'openfda.brand_name:"{name}"+openfda.generic_name:"{name}"',
+                'limit': 1
+            }
+            async with session.get(url, params=params) as response:
+                if response.status != 200:
+                    return None
+                data = await response.json()
+                results = data.get('results')
+                return results[0] if results else None
+        except Exception as e:
+            logger.error("Error fetching FDA label: %s", e)
+            return None
+
+    async def _get(self, endpoint: str, params: Dict, deadline: Optional[Deadline]) -> Tuple[int, Optional[Dict]]:
+        """
+        GET an FDA endpoint, returning the status and the JSON body (None on
+        404). The request is cancelled, closing its connection, if the
+        deadline passes first.
+        """
+        async def fetch():
             async with aiohttp.ClientSession() as session:
-                # Search in drug label endpoint
-                url = f"{self.BASE_URL}/label.json"
-                params = {
-                    'search': f'openfda.brand_name:"{name}"+openfda.generic_name:"{name}"',
-                    'limit': 1
-                }
-                
-                async with session.get(url, params=params) as response:
+                async with session.get(f"{self.BASE_URL}/{endpoint}", params=params) as response:
                     if response.status == 404:
-                        return {"error": "Drug not found"}
-                    
-                    data = await response.json()
-                    
-                    if 'results' not in data or not data['results']:
-                        return {"error": "No results found"}
-                        
-                    result = data['results'][0]
-                    
-                    # Extract relevant information
-                    drug_info = {
-                        "brand_name": self._get_openfda_field(result, 'brand_name'),
-                        "generic_name": self._get_openfda_field(result, 'generic_name'),
-                        "manufacturer": self._get_openfda_field(result, 'manufacturer_name'),
-                        "product_type": self._get_openfda_field(result, 'product_type'),
-                        "route": self._get_openfda_field(result, 'route'),
-                        "active_ingredients": self._get_field(result, 'active_ingredient'),
-                        "purpose": self._get_field(result, 'purpose'),
-                        "warnings": self._get_field(result, 'warnings'),
-                        "dosage_administration": self._get_field(result, 'dosage_and_administration'),
-                        "pregnancy_risk": self._get_field(result, 'pregnancy'),
-                    }
-                    
-                    return drug_info
-                    
-        except Exception as e:
-            print(f"Error searching FDA drug: {str(e)}")
-            return {"error": f"Failed to fetch drug information: {str(e)}"}
-    
-    async def get_drug_interactions(self, name: str) -> Dict:
+                        return response.status, None
+                    return response.status, await response.json()
+
+        return await call_with_deadline(fetch(), deadline, "fda")
+
+    async def get_drug_interactions(self, name: str, deadline: Optional[Deadline] = None) -> Dict:
         """Get drug interactions information"""
+        if self.index is not None:
+            label = self.index.get_label(name)
+            if label:
+                return self._format_interactions(label)
+            if self.offline_only:
+                return {"error": "No results found"}
+        
         try:
-            async with aiohttp.ClientSession() as session:
-                url = f"{self.BASE_URL}/label.json"
-                params = {
-                    'search': f'openfda.brand_name:"{name}"+openfda.generic_name:"{name}"',
-                    'limit': 1
-                }
+            params = {
+                'search': f'openfda.brand_name:"{name}"+openfda.generic_name:"{name}"',
+                'limit': 1
+            }
+            status, data = await self._get("label.json", params, deadline)
+            if status == 404:
+                return {"error": "Drug not found"}
+            
+            if 'results' not in data or not data['results']:
+                return {"error": "No results found"}
                 
-                async with session.get(url, params=params) as response:
-                    if response.status == 404:
-                        return {"error": "Drug not found"}
-                    
-                    data = await response.json()
-                    
-                    if 'results' not in data or not data['results']:
-                        return {"error": "No results found"}
-                        
-                    result = data['results'][0]
-                    
-                    return {
-                        "drug_interactions": self._get_field(result, 'drug_interactions'),
-                        "contraindications": self._get_field(result, 'contraindications'),
-                        "boxed_warnings": self._get_field(result, 'boxed_warning'),
-                    }
+            return self._format_interactions(data['results'][0])
                     
+        except DeadlineExceeded:
+            raise
         except Exception as e:
-            print(f"Error fetching drug interactions: {str(e)}")
+            logger.error("Error fetching drug interactions: %s", e)
             return {"error": f"Failed to fetch drug interactions: {str(e)}"}
     
-    async def get_adverse_events(self, name: str, limit: int = 10) -> Dict:
+    async def get_adverse_events(self, name: str, limit: int = 10, deadline: Optional[Deadline] = None) -> Dict:
         """Get adverse events reports for a drug"""
         try:
-            async with aiohttp.ClientSession() as session:
-                url = f"{self.BASE_URL}/event.json"
-                params = {
-                    'search': f'patient.drug.medicinalproduct:"{name}"',
-                    'limit': limit
+            params = {
+                'search': f'patient.drug.medicinalproduct:"{name}"',
+                'limit': limit
+            }
+            status, data = await self._get("event.json", params, deadline)
+            if status == 404:
+                return {"error": "No adverse events found"}
+            
+            if 'results' not in data or not data['results']:
+                return {"error": "No results found"}
+            
+            events = []
+            for result in data['results']:
+                event = {
+                    "reaction": [r.get('reactionmeddrapt') for r in result.get('patient', {}).get('reaction', [])],
+                    "severity": result.get('serious'),
+                    "outcome": result.get('patient', {}).get('reaction', [{}])[0].get('outcome'),
+                    "report_date": result.get('receiptdate'),
                 }
-                
-                async with session.get(url, params=params) as response:
-                    if response.status == 404:
-                        return {"error": "No adverse events found"}
-                    
-                    data = await response.json()
-                    
-                    if 'results' not in data or not data['results']:
-                        return {"error": "No results found"}
-                    
-                    events = []
-                    for result in data['results']:
-                        event = {
-                            "reaction": [r.get('reactionmeddrapt') for r in result.get('patient', {}).get('reaction', [])],
-                            "severity": result.get('serious'),
-                            "outcome": result.get('patient', {}).get('reaction', [{}])[0].get('outcome'),
-                            "report_date": result.get('receiptdate'),
-                        }
-                        events.append(event)
-                    
-                    return {"adverse_events": events}
+                events.append(event)
+            
+            return {"adverse_events": events}
                     
+        except DeadlineExceeded:
+            raise
         except Exception as e:
-            print(f"Error fetching adverse events: {str(e)}")
+            logger.error("Error fetching adverse events: %s", e)
             return {"error": f"Failed to fetch adverse events: {str(e)}"}
     
+    def format_drug_info(self, result: Dict) -> Dict:
+        """Extract the drug details returned to clients from a label record"""
+        return {
+            "brand_name": self._get_openfda_field(result, 'brand_name'),
+            "generic_name": self._get_openfda_field(result, 'generic_name'),
+            "manufacturer": self._get_openfda_field(result, 'manufacturer_name'),
+            "product_type": self._get_openfda_field(result, 'product_type'),
+            "route": self._get_openfda_field(result, 'route'),
+            "active_ingredients": self._get_field(result, 'active_ingredient'),
+            "purpose": self._get_field(result, 'purpose'),
+            "warnings": self._get_field(result, 'warnings'),
+            "dosage_administration": self._get_field(result, 'dosage_and_administration'),
+            "pregnancy_risk": self._get_field(result, 'pregnancy'),
+        }
+    
+    def _format_interactions(self, result: Dict) -> Dict:
+        """Extract interaction and contraindication text from a label record"""
+        return {
+            "drug_interactions": self._get_field(result, 'drug_interactions'),
+            "contraindications": self._get_field(result, 'contraindications'),
+            "boxed_warnings": self._get_field(result, 'boxed_warning'),
+        }
+    
     def _get_openfda_field(self, data: Dict, field: str) -> Optional[str]:
         """Helper to get field from openfda section"""
         try:
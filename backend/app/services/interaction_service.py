@@ -0,0 +1,210 @@
+import asyncio
+from collections import deque
+from typing import Dict, Iterator, List, Optional, Tuple
+import aiohttp
+from .fda_service import FDAService
+from .cancellation import Deadline, call_with_deadline
+
+# Label sections scanned for mentions of the other prescribed drugs
+INTERACTION_SECTIONS = ["drug_interactions", "contraindications", "boxed_warning", "warnings"]
+
+# Dosage-form and unit words that must not be used as drug synonyms
+FORM_WORDS = {
+    "tab", "tabs", "tablet", "tablets", "cap", "caps", "capsule", "capsules",
+    "syrup", "susp", "suspension", "inj", "injection", "cream", "gel", "drops",
+    "oral", "sr", "er", "xr", "cr", "mr", "ds", "forte", "plus", "mg", "mcg", "ml",
+    "hydrochloride", "hcl", "sodium", "potassium",
+}
+
+MIN_TERM_LENGTH = 4
+EXCERPT_RADIUS = 120
+
+
+def normalize(text: str) -> str:
+    """Lowercase and blank out non-alphanumerics, keeping offsets aligned with the input"""
+    return "".join(c if c.isalnum() else " " for c in text.lower())
+
+
+def _clean_term(text: str) -> str:
+    # Drops strengths too, whether "5 mg" or "5mg"
+    words = [w for w in normalize(text).split() if not w[0].isdigit() and w not in FORM_WORDS]
+    return " ".join(words)
+
+
+class AhoCorasick:
+    """Multi-pattern matcher finding every term occurrence in a single pass over the text"""
+
+    def __init__(self):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[List[Tuple[str, object]]] = [[]]
+
+    def add(self, term: str, value: object):
+        node = 0
+        for char in term:
+            if char not in self.goto[node]:
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+                self.goto[node][char] = len(self.goto) - 1
+            node = self.goto[node][char]
+        self.output[node].append((term, value))
+
+    def build(self):
+        """Compute failure links breadth-first"""
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                state = self.fail[node]
+                while state and char not in self.goto[state]:
+                    state = self.fail[state]
+                self.fail[child] = self.goto[state].get(char, 0)
+                if self.fail[child] == child:
+                    self.fail[child] = 0
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, str, object]]:
+        """Yield (start, end, term, value) for every whole-word match"""
+        node = 0
+        for i, char in enumerate(text):
+            while node and char not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(char, 0)
+            for term, value in self.output[node]:
+                start, end = i - len(term) + 1, i + 1
+                if (start == 0 or text[start - 1] == " ") and (end == len(text) or text[end] == " "):
+                    yield start, end, term, value
+
+
+def _lookup_names(medicine_name: str) -> List[Tuple[str, Optional[str]]]:
+    """
+    Names to look a prescribed drug's label up by, each with the word the
+    label's own names must contain for the match to count: the name without
+    dosage form and strength ("Tab. Advil 200mg" -> "advil"), then its first
+    word as a fallback ("Advil Liqui-Gels" -> "advil")
+    """
+    term = _clean_term(medicine_name)
+    if not term:
+        return [(medicine_name.strip(), None)]
+    names: List[Tuple[str, Optional[str]]] = [(term, None)]
+    if " " in term:
+        first_word = term.split()[0]
+        names.append((first_word, first_word))
+    return names
+
+
+def _openfda_names(label: Dict) -> List[str]:
+    openfda = label.get("openfda", {})
+    names = []
+    for field in ("brand_name", "generic_name", "substance_name"):
+        names.extend(_clean_term(name) for name in openfda.get(field, []))
+    return [name for name in names if name]
+
+
+def _label_terms(medicine_name: str, label: Optional[Dict]) -> List[str]:
+    """
+    Normalized names identifying one prescribed drug: its full cleaned name
+    and the brand, generic and substance names of its label. Single words
+    of the prescribed name are never terms on their own, as "Liver Tonic"
+    would then match every "Liver warning".
+    """
+    candidates = [_clean_term(medicine_name)]
+    if label:
+        candidates.extend(_openfda_names(label))
+    terms = []
+    for term in candidates:
+        if len(term) >= MIN_TERM_LENGTH and term not in terms:
+            terms.append(term)
+    return terms
+
+
+def _excerpt(text: str, start: int, end: int) -> str:
+    left = max(0, start - EXCERPT_RADIUS)
+    right = min(len(text), end + EXCERPT_RADIUS)
+    return ("..." if left else "") + text[left:right].strip() + ("..." if right < len(text) else "")
+
+
+class InteractionService:
+    """Cross-checks every pair of drugs in a prescription against their FDA labels"""
+
+    def __init__(self, fda_service: FDAService):
+        self.fda_service = fda_service
+
+    async def fetch_label(self, name: str, session: aiohttp.ClientSession) -> Optional[Dict]:
+        """
+        Label of one prescribed medicine, looked up by its name without
+        dosage form and strength, then by the first word of that name. A
+        label found by the first word only counts if it is named by it.
+        """
+        for lookup_name, required_word in _lookup_names(name):
+            label = await self.fda_service.get_label(lookup_name, session)
+            if not label:
+                continue
+            if required_word is None or any(required_word in n.split() for n in _openfda_names(label)):
+                return label
+        return None
+
+    async def fetch_labels(self, names: List[str], deadline: Optional[Deadline] = None) -> List[Optional[Dict]]:
+        """Fetch all labels concurrently over one HTTP session"""
+        async with aiohttp.ClientSession() as session:
+            return await asyncio.gather(
+                *(call_with_deadline(self.fetch_label(name, session), deadline, "fda") for name in names)
+            )
+
+    async def check_prescription(self, names: List[str], deadline: Optional[Deadline] = None) -> Dict:
+        """
+        Build a pairwise interaction matrix for the given medicine names.
+
+        matrix[i][j] is True when the label of either drug mentions the
+        other in its interaction, contraindication or warning text.
+        """
+        labels = await self.fetch_labels(names, deadline)
+        return self.build_matrix(names, labels)
+
+    def build_matrix(self, names: List[str], labels: List[Optional[Dict]]) -> Dict:
+        matcher = AhoCorasick()
+        terms_by_drug = []
+        for i, (name, label) in enumerate(zip(names, labels)):
+            terms = _label_terms(name, label)
+            terms_by_drug.append(terms)
+            for term in terms:
+                matcher.add(term, i)
+        matcher.build()
+
+        size = len(names)
+        matrix = [[False] * size for _ in range(size)]
+        findings: Dict[Tuple[int, int], List[Dict]] = {}
+
+        for i, label in enumerate(labels):
+            if not label:
+                continue
+            for section in INTERACTION_SECTIONS:
+                text = " ".join(label.get(section, []))
+                if not text:
+                    continue
+                seen = set()
+                for start, end, term, j in matcher.iter_matches(normalize(text)):
+                    # A label mentioning its own drug, or the same drug twice per section, adds nothing
+                    if j == i or set(terms_by_drug[j]) & set(terms_by_drug[i]) or j in seen:
+                        continue
+                    seen.add(j)
+                    matrix[i][j] = matrix[j][i] = True
+                    findings.setdefault(tuple(sorted((i, j))), []).append({
+                        "source": names[i],
+                        "section": section,
+                        "matched_term": term,
+                        "excerpt": _excerpt(text, start, end),
+                    })
+
+        interactions = [
+            {"drug_a": names[a], "drug_b": names[b], "evidence": evidence}
+            for (a, b), evidence in sorted(findings.items())
+        ]
+        return {
+            "medicines": names,
+            "matrix": matrix,
+            "interactions": interactions,
+            "unresolved": [name for name, label in zip(names, labels) if not label],
+        }
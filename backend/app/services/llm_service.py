@@ -4,6 +4,11 @@ import os
 from typing import Dict, Any, Optional
 from dotenv import load_dotenv
 from ..models.prescription import PrescriptionData
+from .cancellation import Deadline, call_with_deadline
+from .long_document import analyze_in_chunks, is_long_document
+import logging
+
+logger = logging.getLogger(__name__)
 
 # Load environment variables
 load_dotenv()
@@ -59,22 +64,31 @@ def list_available_models():
         
         genai.configure(api_key=api_key)
         for m in genai.list_models():
-            print(f"Model: {m.name}")
-            print(f"Supported methods: {m.supported_generation_methods}")
-            print("---")
+            logger.info("Model: %s supports %s", m.name, m.supported_generation_methods)
     except Exception as e:
-        print(f"Error listing models: {str(e)}")
+        logger.error("Error listing models: %s", e)
 
-async def analyze_prescription(text: str) -> PrescriptionData:
+async def analyze_prescription(text: str, deadline: Optional[Deadline] = None) -> PrescriptionData:
     """
     Analyze prescription text using Google's Gemini 2.0 Flash model.
     
+    Long documents (multi-page PDFs, discharge summaries) are split into
+    chunks; the chunks with medication content are analyzed concurrently
+    and their results merged. Shorter text is analyzed in a single call.
+    
     Args:
         text: The prescription text to analyze
+        deadline: End-to-end request deadline; the Gemini calls are cancelled when it passes
     
     Returns:
         Structured prescription data
     """
+    if is_long_document(text):
+        return await analyze_in_chunks(text, lambda chunk: _analyze_prescription_text(chunk, deadline))
+    return await _analyze_prescription_text(text, deadline)
+
+async def _analyze_prescription_text(text: str, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+    """Analyze one piece of prescription text with a single Gemini call"""
     try:
         # Get the API key
         api_key = os.getenv('GOOGLE_API_KEY')
@@ -90,15 +104,15 @@ async def analyze_prescription(text: str) -> PrescriptionData:
         # Create the prompt
         prompt = f"{SYSTEM_PROMPT}\n\nPrescription text:\n{text}\n\nRemember: Respond with ONLY the JSON object, no additional text."
         
-        # Generate response
-        response = model.generate_content(prompt)
+        # Generate response; awaiting the async call lets it be cancelled
+        response = await call_with_deadline(model.generate_content_async(prompt), deadline, "llm")
         
         # Check if response is empty
         if not response.text:
             raise Exception("Empty response from Gemini")
             
-        # Print the raw response for debugging
-        print(f"Raw Gemini response: {response.text}")
+        # Log the response size only; the text itself is redacted
+        logger.debug("Raw Gemini response received", extra={"raw_response": response.text})
         
         # Clean the response text
         cleaned_text = response.text.strip()
@@ -109,8 +123,7 @@ async def analyze_prescription(text: str) -> PrescriptionData:
         try:
             result = json.loads(cleaned_text)
         except json.JSONDecodeError as e:
-            print(f"Failed to parse JSON: {e}")
-            print(f"Cleaned response text: {cleaned_text}")
+            logger.warning("Failed to parse JSON: %s", e, extra={"response_text": cleaned_text})
             raise Exception(f"Invalid JSON response from Gemini: {str(e)}")
         
         # Validate the result structure
@@ -129,10 +142,10 @@ async def analyze_prescription(text: str) -> PrescriptionData:
         return result
 
     except Exception as e:
-        print(f"Error in analyze_prescription: {str(e)}")
+        logger.error("Error in analyze_prescription: %s", e)
         raise 
 
-async def analyze_drug_info(medicine_name: str) -> Dict[str, Optional[str]]:
+async def analyze_drug_info(medicine_name: str, deadline: Optional[Deadline] = None) -> Dict[str, Optional[str]]:
     """
     Analyze drug information using Gemini 2.0 Flash
     """
@@ -170,11 +183,12 @@ async def analyze_drug_info(medicine_name: str) -> Dict[str, Optional[str]]:
         5. Maximum 2 sentences per field
         """
         
-        # Generate response and ensure we get the text
-        response = model.generate_content(prompt)
+        # Generate response without blocking the event loop, so the call
+        # can race the FDA lookup and be cancelled when it loses
+        response = await call_with_deadline(model.generate_content_async(prompt), deadline, "llm")
         
-        # Print the raw response for debugging
-        print(f"Raw Gemini response: {response.text}")
+        # Log the response size only; the text itself is redacted
+        logger.debug("Raw Gemini response received", extra={"raw_response": response.text})
         
         # Parse the response text as JSON
         try:
@@ -194,8 +208,7 @@ async def analyze_drug_info(medicine_name: str) -> Dict[str, Optional[str]]:
             
             return drug_info
         except json.JSONDecodeError as e:
-            print(f"Failed to parse JSON: {e}")
-            print(f"Cleaned response text: {cleaned_text}")
+            logger.warning("Failed to parse JSON: %s", e, extra={"response_text": cleaned_text})
             # If JSON parsing fails, return a structured response with the raw information
             return {
                 "brand_name": None,
@@ -209,5 +222,5 @@ async def analyze_drug_info(medicine_name: str) -> Dict[str, Optional[str]]:
             }
         
     except Exception as e:
-        print(f"Error in analyze_drug_info: {str(e)}")
+        logger.error("Error in analyze_drug_info: %s", e)
         raise 
\ No newline at end of file
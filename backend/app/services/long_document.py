@@ -0,0 +1,237 @@
+import asyncio
+import logging
+import os
+import re
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from .cancellation import DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+# perform_ocr separates PDF pages with a form feed
+PAGE_BREAK = "\f"
+
+LONG_DOCUMENT_THRESHOLD = int(os.getenv("LONG_DOCUMENT_THRESHOLD_CHARS", "12000"))
+CHUNK_MAX_CHARS = int(os.getenv("LONG_DOCUMENT_CHUNK_CHARS", "6000"))
+CHUNK_CONCURRENCY = int(os.getenv("LONG_DOCUMENT_CONCURRENCY", "4"))
+MEDICATION_SCORE_THRESHOLD = 1
+
+# Lines that open a new section of a discharge summary or prescription
+SECTION_HEADING = re.compile(
+    r"^\s*(?:[A-Z][A-Z /&()-]{3,60}|(?i:"
+    r"(?:discharge |current |home )?medications?|rx|prescriptions?|diagnosis|"
+    r"history|investigations?|advice|plan|treatment|follow[- ]up))\s*:?\s*$",
+    re.MULTILINE,
+)
+
+DOSE_PATTERN = re.compile(r"\b\d+(?:\.\d+)?\s*(?:mg|mcg|µg|g|ml|iu|units?)\b", re.IGNORECASE)
+FREQUENCY_PATTERN = re.compile(
+    r"\b(?:od|bd|bid|tid|tds|qid|qd|hs|sos|prn|stat|once daily|twice daily|thrice daily|"
+    r"\d-\d-\d|morning|night|bedtime|after food|before food|for \d+ (?:days?|weeks?|months?))\b",
+    re.IGNORECASE,
+)
+FORM_PATTERN = re.compile(r"\b(?:tab|tabs|tablet|cap|caps|capsule|syp|syrup|inj|injection|drops|ointment)\b\.?", re.IGNORECASE)
+MEDICATION_HEADING_PATTERN = re.compile(
+    r"^\s*(?:discharge |current |home )?(?:rx|medications?|prescriptions?|treatment advised)\b",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+AnalyzeFn = Callable[[str], Awaitable[Dict[str, Any]]]
+
+
+def is_long_document(text: str) -> bool:
+    return len(text) > LONG_DOCUMENT_THRESHOLD
+
+
+def _split_oversized(page: str, max_chars: int) -> List[str]:
+    """Split a page on section headings, then on blank lines, then hard-wrap"""
+    starts = [m.start() for m in SECTION_HEADING.finditer(page)]
+    sections = [page[a:b] for a, b in zip([0] + starts, starts + [len(page)]) if page[a:b].strip()]
+    pieces = []
+    for section in sections:
+        if len(section) <= max_chars:
+            pieces.append(section)
+            continue
+        for paragraph in re.split(r"\n\s*\n", section):
+            while len(paragraph) > max_chars:
+                cut = paragraph.rfind("\n", 0, max_chars)
+                cut = cut if cut > 0 else max_chars
+                pieces.append(paragraph[:cut])
+                paragraph = paragraph[cut:]
+            if paragraph.strip():
+                pieces.append(paragraph)
+    return pieces
+
+
+def split_chunks(text: str, max_chars: int = CHUNK_MAX_CHARS) -> List[str]:
+    """
+    Split a document into chunks of at most `max_chars`, following page
+    breaks and section headings, and packing small neighbours together.
+    """
+    pieces = []
+    for page in text.split(PAGE_BREAK):
+        if not page.strip():
+            continue
+        if len(page) <= max_chars:
+            pieces.append(page)
+        else:
+            pieces.extend(_split_oversized(page, max_chars))
+
+    chunks = []
+    for piece in pieces:
+        if chunks and len(chunks[-1]) + len(piece) + 1 <= max_chars:
+            chunks[-1] = chunks[-1] + "\n" + piece
+        else:
+            chunks.append(piece)
+    return chunks
+
+
+def medication_score(chunk: str) -> int:
+    """
+    Cheap local estimate of how much of a chunk is medication orders: the
+    number of lines with at least two of a dose, a dosage form and a
+    frequency (a lone "13.2 g/dl" lab value does not count), plus one for
+    a medication section heading.
+    """
+    score = 0
+    for line in chunk.splitlines():
+        signals = sum(bool(p.search(line)) for p in (DOSE_PATTERN, FORM_PATTERN, FREQUENCY_PATTERN))
+        if signals >= 2:
+            score += 1
+    if MEDICATION_HEADING_PATTERN.search(chunk):
+        score += 1
+    return score
+
+
+def select_chunks(chunks: List[str]) -> List[int]:
+    """
+    Indexes of the chunks worth sending to the LLM: every chunk that looks
+    like it holds medication orders, plus the first one, which carries the
+    patient and doctor details. If nothing scores, send everything rather
+    than risk dropping medicines.
+    """
+    selected = [i for i, chunk in enumerate(chunks) if medication_score(chunk) >= MEDICATION_SCORE_THRESHOLD]
+    if not selected:
+        return list(range(len(chunks)))
+    if 0 not in selected:
+        selected.insert(0, 0)
+    return selected
+
+
+def _normalize(value: Optional[str]) -> str:
+    value = FORM_PATTERN.sub(" ", (value or "").lower())
+    return re.sub(r"[^a-z0-9.]+", "", value)
+
+
+def _medicine_key(medicine: Dict) -> Tuple[str, str]:
+    return _normalize(medicine.get("name")), _normalize(medicine.get("dosage"))
+
+
+def merge_medicines(results: List[Dict]) -> List[Dict]:
+    """
+    Union of the medicines of every chunk, deduplicated by normalized name
+    and dosage. The higher-confidence entry wins and gaps in it are filled
+    from the duplicate.
+    """
+    merged: Dict[Tuple[str, str], Dict] = {}
+    for result in results:
+        for medicine in result.get("medicines", []):
+            key = _medicine_key(medicine)
+            if not key[0]:
+                continue
+            existing = merged.get(key)
+            if existing is None:
+                merged[key] = dict(medicine)
+                continue
+            if medicine.get("confidence", 0) > existing.get("confidence", 0):
+                existing, medicine = dict(medicine), existing
+                merged[key] = existing
+            for field, value in medicine.items():
+                if not existing.get(field) and value:
+                    existing[field] = value
+    return list(merged.values())
+
+
+def _merge_info(results: List[Dict], section: str) -> Dict:
+    """First non-empty value of each field, in document order"""
+    merged: Dict[str, Any] = {}
+    for result in results:
+        for field, value in (result.get(section) or {}).items():
+            if value and not merged.get(field):
+                merged[field] = value
+    return merged
+
+
+def merge_results(results: List[Dict]) -> Dict:
+    merged = {
+        "medicines": merge_medicines(results),
+        "patientInfo": _merge_info(results, "patientInfo"),
+        "doctorInfo": _merge_info(results, "doctorInfo"),
+    }
+    diagnoses = []
+    for result in results:
+        diagnosis = result.get("diagnosis")
+        if diagnosis and diagnosis not in diagnoses:
+            diagnoses.append(diagnosis)
+    if diagnoses:
+        merged["diagnosis"] = "; ".join(diagnoses)
+    return merged
+
+
+class IncompleteAnalysis(Exception):
+    """A selected chunk of a long document could not be analyzed"""
+
+    def __init__(self, failed: List[int], total: int, cause: BaseException):
+        self.failed = failed
+        self.total = total
+        numbers = ", ".join(str(i + 1) for i in failed)
+        super().__init__(f"Could not analyze chunk(s) {numbers} of {total} of the document: {cause}")
+
+
+async def analyze_in_chunks(text: str, analyze_chunk: AnalyzeFn) -> Dict[str, Any]:
+    """
+    Map-reduce analysis of a long document: split it, keep the chunks with
+    medication content, analyze them concurrently and merge the results.
+
+    Every selected chunk may hold medicines, so the analysis fails as a
+    whole (IncompleteAnalysis) rather than return a partial list when one
+    of them fails; the other chunk calls still running are cancelled.
+    """
+    chunks = split_chunks(text)
+    selected = select_chunks(chunks)
+    logger.info("Analyzing long document in chunks", extra={
+        "chars": len(text),
+        "chunks": len(chunks),
+        "selected_chunks": len(selected),
+    })
+
+    semaphore = asyncio.Semaphore(CHUNK_CONCURRENCY)
+
+    async def run(index: int) -> Dict:
+        async with semaphore:
+            return await analyze_chunk(chunks[index])
+
+    tasks = [asyncio.ensure_future(run(i)) for i in selected]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    failed = [
+        (index, task.exception()) for index, task in zip(selected, tasks)
+        if not task.cancelled() and task.exception() is not None
+    ]
+    if failed:
+        # Past the deadline the other chunks are moot too
+        for _, error in failed:
+            if isinstance(error, DeadlineExceeded):
+                raise error
+        logger.warning("Chunk analysis failed", extra={
+            "failed_chunks": [index for index, _ in failed],
+            "selected_chunks": len(selected),
+        })
+        raise IncompleteAnalysis([index for index, _ in failed], len(chunks), failed[0][1]) from failed[0][1]
+
+    return merge_results([task.result() for task in tasks])
@@ -1,20 +1,201 @@
 from google.cloud import vision
 import os
 from dotenv import load_dotenv
+import asyncio
 import base64
+import multiprocessing
 import PyPDF2
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
 from io import BytesIO
+from typing import NamedTuple, Optional, Tuple
+import logging
+from .cancellation import Deadline, DeadlineExceeded, call_with_deadline
+from .long_document import PAGE_BREAK
+
+try:
+    import pytesseract
+    from PIL import Image
+except ImportError:  # the local OCR engine is optional
+    pytesseract = None
+
+logger = logging.getLogger(__name__)
 
 # Load environment variables
 load_dotenv()
 
-async def perform_ocr(image_base64: str, is_pdf: bool = False) -> str:
+# "vision" (Google Cloud Vision), "local" (Tesseract on CPU) or "auto"
+# (local first, escalating to Vision when its confidence is low)
+OCR_ENGINE = os.getenv("OCR_ENGINE", "vision").lower()
+OCR_ESCALATION_CONFIDENCE = float(os.getenv("OCR_ESCALATION_CONFIDENCE", "80"))
+OCR_LOCAL_WORKERS = int(os.getenv("OCR_LOCAL_WORKERS", str(os.cpu_count() or 2)))
+OCR_TESSERACT_LANG = os.getenv("OCR_TESSERACT_LANG", "eng")
+
+ocr_stats = {"local": 0, "vision": 0, "escalated": 0}
+
+
+class OCRResult(NamedTuple):
+    text: str
+    confidence: Optional[float]  # 0-100, None when the engine reports none
+    engine: str
+
+
+class OCREngine(ABC):
+    """Interface of the OCR backends used for image uploads"""
+
+    name = "base"
+
+    @abstractmethod
+    async def recognize(self, content: bytes, deadline: Optional[Deadline] = None) -> OCRResult:
+        """Extract the text of one image"""
+
+
+class VisionOCREngine(OCREngine):
+    """Google Cloud Vision text detection"""
+
+    name = "vision"
+
+    async def recognize(self, content: bytes, deadline: Optional[Deadline] = None) -> OCRResult:
+        api_key = os.getenv('GOOGLE_API_KEY')
+        if not api_key:
+            raise Exception("GOOGLE_API_KEY environment variable not set")
+
+        # Create an async client with API key, so the call does not
+        # block the event loop and can be cancelled
+        client = vision.ImageAnnotatorAsyncClient(
+            client_options={"api_key": api_key}
+        )
+        
+        # Perform text detection
+        request = vision.AnnotateImageRequest(
+            image=vision.Image(content=content),
+            features=[vision.Feature(type_=vision.Feature.Type.TEXT_DETECTION)],
+        )
+        batch = await call_with_deadline(
+            client.batch_annotate_images(requests=[request]), deadline, "ocr"
+        )
+        response = batch.responses[0]
+        ocr_stats["vision"] += 1
+        
+        # Check for errors in the response
+        if response.error.message:
+            raise Exception(f"Google Cloud Vision API error: {response.error.message}")
+            
+        # Get the text annotations
+        texts = response.text_annotations
+        
+        if not texts:
+            return OCRResult("", None, self.name)
+        
+        pages = response.full_text_annotation.pages
+        confidence = sum(page.confidence for page in pages) / len(pages) * 100 if pages else None
+            
+        # Get the full text (first annotation contains the full text)
+        return OCRResult(texts[0].description, confidence, self.name)
+
+
+def _tesseract_ocr(content: bytes, lang: str) -> Tuple[str, Optional[float]]:
+    """Run Tesseract on one image; executed in a worker process"""
+    try:
+        image = Image.open(BytesIO(content)).convert("L")
+        data = pytesseract.image_to_data(image, lang=lang, output_type=pytesseract.Output.DICT)
+    except Exception as e:
+        # pytesseract exceptions do not survive pickling back to the parent
+        raise RuntimeError(f"Tesseract OCR failed: {e}") from None
+
+    lines = {}
+    confidences = []
+    for i, word in enumerate(data["text"]):
+        confidence = float(data["conf"][i])
+        if not word.strip() or confidence < 0:
+            continue
+        key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        lines.setdefault(key, []).append(word)
+        confidences.append(confidence)
+
+    text = "\n".join(" ".join(words) for words in lines.values())
+    return text, (sum(confidences) / len(confidences) if confidences else None)
+
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    if _process_pool is None:
+        # Spawned rather than forked: forking after gRPC has started is unsafe
+        _process_pool = ProcessPoolExecutor(
+            max_workers=OCR_LOCAL_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _process_pool
+
+
+class TesseractOCREngine(OCREngine):
+    """Local Tesseract OCR, run on CPU in a process pool"""
+
+    name = "local"
+
+    def __init__(self, lang: str = OCR_TESSERACT_LANG):
+        self.lang = lang
+
+    async def recognize(self, content: bytes, deadline: Optional[Deadline] = None) -> OCRResult:
+        if pytesseract is None:
+            raise Exception("Local OCR requires the pytesseract and Pillow packages")
+        loop = asyncio.get_running_loop()
+        text, confidence = await call_with_deadline(
+            loop.run_in_executor(_get_process_pool(), _tesseract_ocr, content, self.lang), deadline, "ocr"
+        )
+        ocr_stats["local"] += 1
+        return OCRResult(text, confidence, self.name)
+
+
+class EscalatingOCREngine(OCREngine):
+    """Try the local engine first and fall back to Vision when it is unsure"""
+
+    name = "auto"
+
+    def __init__(self, local: OCREngine, remote: OCREngine, min_confidence: float):
+        self.local = local
+        self.remote = remote
+        self.min_confidence = min_confidence
+
+    async def recognize(self, content: bytes, deadline: Optional[Deadline] = None) -> OCRResult:
+        try:
+            result = await self.local.recognize(content, deadline)
+            if result.text.strip() and result.confidence is not None and result.confidence >= self.min_confidence:
+                return result
+            logger.info("Escalating OCR to Vision", extra={"local_confidence": result.confidence})
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            logger.warning("Local OCR failed, escalating to Vision: %s", e)
+        ocr_stats["escalated"] += 1
+        return await self.remote.recognize(content, deadline)
+
+
+def get_ocr_engine(name: Optional[str] = None) -> OCREngine:
+    """Build the OCR engine selected by name or by OCR_ENGINE"""
+    name = (name or OCR_ENGINE).lower()
+    if name == "vision":
+        return VisionOCREngine()
+    if name in ("local", "tesseract"):
+        return TesseractOCREngine()
+    if name == "auto":
+        return EscalatingOCREngine(TesseractOCREngine(), VisionOCREngine(), OCR_ESCALATION_CONFIDENCE)
+    raise ValueError(f"Unknown OCR engine: {name}")
+
+
+ocr_engine = get_ocr_engine()
+
+async def perform_ocr(image_base64: str, is_pdf: bool = False, deadline: Optional[Deadline] = None) -> str:
     """
-    Perform OCR on the given image or PDF using Google Cloud Vision API.
+    Perform OCR on the given image or PDF. Images go to the engine
+    selected by OCR_ENGINE (Google Cloud Vision by default).
     
     Args:
         image_base64: Base64 encoded image/PDF data
         is_pdf: Whether the input is a PDF file
+        deadline: End-to-end request deadline; the OCR call is cancelled when it passes
     
     Returns:
         Extracted text from the image/PDF
@@ -31,9 +212,12 @@ async def perform_ocr(image_base64: str, is_pdf: bool = False) -> str:
             
             # Extract text from each page
             for page in pdf_reader.pages:
+                if deadline:
+                    deadline.check("PDF text extraction")
                 page_text = page.extract_text()
                 if page_text:
-                    text += page_text + "\n"
+                    # Page breaks let long documents be chunked by page
+                    text += page_text + "\n" + PAGE_BREAK
             
             if not text.strip():
                 raise Exception("No text could be extracted from the PDF")
@@ -41,43 +225,23 @@ async def perform_ocr(image_base64: str, is_pdf: bool = False) -> str:
             return text
             
         else:
-            # Handle image files
-            api_key = os.getenv('GOOGLE_API_KEY')
-            if not api_key:
-                raise Exception("GOOGLE_API_KEY environment variable not set")
-
-            # Create a client with API key
-            client = vision.ImageAnnotatorClient(
-                client_options={"api_key": api_key}
-            )
-            
-            # Create the image object
-            image = vision.Image(content=content)
-            
-            # Perform text detection
-            response = client.text_detection(image=image)
+            # Handle image files with the configured OCR engine
+            result = await ocr_engine.recognize(content, deadline)
+            logger.info("OCR completed", extra={"engine": result.engine, "confidence": result.confidence})
             
-            # Check for errors in the response
-            if response.error.message:
-                raise Exception(f"Google Cloud Vision API error: {response.error.message}")
-                
-            # Get the text annotations
-            texts = response.text_annotations
-            
-            if not texts:
+            if not result.text:
                 return ""
-                
-            # Get the full text (first annotation contains the full text)
-            full_text = texts[0].description
             
             # Check if we got any text
-            if not full_text.strip():
+            if not result.text.strip():
                 raise Exception("No text detected in the image")
                 
-            return full_text
+            return result.text
             
+    except DeadlineExceeded:
+        raise
     except Exception as e:
-        print(f"Error performing OCR: {str(e)}")
+        logger.error("Error performing OCR: %s", e)
         # Provide more specific error messages
         if "GOOGLE_API_KEY" in str(e):
             raise Exception("Google Cloud Vision API key is not configured. Please set the GOOGLE_API_KEY environment variable.")
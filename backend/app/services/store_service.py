@@ -4,6 +4,9 @@ from typing import List, Dict, Optional
 import json
 from pathlib import Path
 import os
+import logging
+
+logger = logging.getLogger(__name__)
 
 class StoreService:
     def __init__(self):
@@ -39,7 +42,7 @@ class StoreService:
             self.stores_cache = stores
             return stores
         except Exception as e:
-            print(f"Error loading PDF: {str(e)}")
+            logger.error("Error loading PDF: %s", e)
             return []
 
     def load_stores(self) -> List[Dict]:
@@ -49,7 +52,7 @@ class StoreService:
             with open(json_path, 'r') as f:
                 return json.load(f)
         except Exception as e:
-            print(f"Error loading stores: {e}")
+            logger.error("Error loading stores: %s", e)
             return []
 
     def search_stores(self, postal_code: Optional[str] = None, 
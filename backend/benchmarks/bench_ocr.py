@@ -0,0 +1,142 @@
+"""
+Throughput and accuracy of the OCR engines on a set of prescription images.
+
+Each image in the fixture directory (.png/.jpg) needs a sibling .txt file
+with its ground-truth text. Without real fixtures, --synthetic renders
+that many typed prescriptions first.
+
+Usage:
+    python -m benchmarks.bench_ocr --fixtures benchmarks/fixtures/ocr
+    python -m benchmarks.bench_ocr --synthetic 20 --engines local
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+from app.services.ocr_service import get_ocr_engine, pytesseract
+
+MEDICINES = [
+    ("Tab. Paracetamol", "500 mg"), ("Tab. Metformin", "500 mg"), ("Cap. Amoxicillin", "250 mg"),
+    ("Tab. Atorvastatin", "10 mg"), ("Tab. Amlodipine", "5 mg"), ("Syp. Cetirizine", "5 ml"),
+    ("Tab. Pantoprazole", "40 mg"), ("Tab. Azithromycin", "500 mg"), ("Tab. Losartan", "50 mg"),
+]
+FREQUENCIES = ["1-0-1", "1-1-1", "0-0-1", "OD", "BD", "TDS"]
+
+
+def render_synthetic(directory: Path, count: int, seed: int = 0):
+    """Render typed prescriptions with their ground truth"""
+    from PIL import Image, ImageDraw, ImageFont
+
+    rng = random.Random(seed)
+    try:
+        font = ImageFont.load_default(size=28)
+    except TypeError:  # Pillow without FreeType sizing
+        font = ImageFont.load_default()
+
+    for n in range(count):
+        lines = [f"Patient: Patient {n:03d}", f"Age: {rng.randint(18, 80)}", "Rx"]
+        for name, dose in rng.sample(MEDICINES, rng.randint(2, 5)):
+            lines.append(f"{name} {dose} {rng.choice(FREQUENCIES)} x {rng.randint(3, 30)} days")
+        lines.append("Dr. A. Sharma, MBBS")
+
+        image = Image.new("L", (1100, 60 + 48 * len(lines)), color=255)
+        draw = ImageDraw.Draw(image)
+        for i, line in enumerate(lines):
+            draw.text((40, 30 + 48 * i), line, fill=0, font=font)
+        image = image.rotate(rng.uniform(-1.5, 1.5), fillcolor=255, expand=True)
+
+        image.save(directory / f"rx_{n:03d}.png")
+        (directory / f"rx_{n:03d}.txt").write_text("\n".join(lines))
+
+
+def load_fixtures(directory: Path) -> List[Tuple[bytes, str]]:
+    fixtures = []
+    for image_path in sorted(directory.iterdir()):
+        truth_path = image_path.with_suffix(".txt")
+        if image_path.suffix.lower() in (".png", ".jpg", ".jpeg") and truth_path.exists():
+            fixtures.append((image_path.read_bytes(), truth_path.read_text()))
+    return fixtures
+
+
+def char_error_rate(predicted: str, truth: str) -> float:
+    """Levenshtein distance over whitespace-normalized text, relative to the truth length"""
+    a, b = " ".join(predicted.split()), " ".join(truth.split())
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1] / max(len(b), 1)
+
+
+def engine_available(name: str) -> Tuple[bool, str]:
+    if name in ("local", "auto"):
+        if pytesseract is None:
+            return False, "pytesseract/Pillow not installed"
+        try:
+            pytesseract.get_tesseract_version()
+        except Exception:
+            return False, "tesseract binary not found"
+    if name in ("vision", "auto") and not os.getenv("GOOGLE_API_KEY"):
+        return False, "GOOGLE_API_KEY not set"
+    return True, ""
+
+
+async def run_engine(name: str, fixtures: List[Tuple[bytes, str]], concurrency: int) -> dict:
+    engine = get_ocr_engine(name)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(content: bytes, truth: str):
+        async with semaphore:
+            result = await engine.recognize(content)
+            return char_error_rate(result.text, truth), result.confidence
+
+    started = time.perf_counter()
+    outcomes = await asyncio.gather(*(one(content, truth) for content, truth in fixtures))
+    elapsed = time.perf_counter() - started
+
+    confidences = [c for _, c in outcomes if c is not None]
+    return {
+        "images_per_s": len(fixtures) / elapsed,
+        "cer": sum(cer for cer, _ in outcomes) / len(outcomes),
+        "confidence": sum(confidences) / len(confidences) if confidences else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare OCR engines on prescription images")
+    parser.add_argument("--fixtures", type=Path, default=Path(__file__).parent / "fixtures" / "ocr")
+    parser.add_argument("--synthetic", type=int, default=0, help="Render N synthetic prescriptions instead")
+    parser.add_argument("--engines", default="local,vision,auto")
+    parser.add_argument("--concurrency", type=int, default=os.cpu_count() or 2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = args.fixtures
+        if args.synthetic:
+            directory = Path(tmp)
+            render_synthetic(directory, args.synthetic)
+        fixtures = load_fixtures(directory)
+        if not fixtures:
+            parser.error(f"no image/.txt fixture pairs in {directory}; use --synthetic N")
+
+        print(f"{len(fixtures)} images from {directory}")
+        print(f"{'engine':<10}{'images/s':>10}{'CER':>8}{'confidence':>12}")
+        for name in args.engines.split(","):
+            available, reason = engine_available(name)
+            if not available:
+                print(f"{name:<10}  skipped: {reason}")
+                continue
+            stats = asyncio.run(run_engine(name, fixtures, args.concurrency))
+            confidence = f"{stats['confidence']:.1f}" if stats["confidence"] is not None else "-"
+            print(f"{name:<10}{stats['images_per_s']:>10.2f}{stats['cer']:>8.3f}{confidence:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Payload size and serialization time of drug label responses, before and
+after the orjson response class, compression and ?fields= projection.
+
+Usage:
+    python -m benchmarks.bench_responses
+"""
+import json
+import random
+import timeit
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from app.api.responses import project
+from app.middleware.compression import brotli, compress
+
+# Fields the medicine summary card renders
+SUMMARY_FIELDS = ["brand_name", "generic_name", "manufacturer", "purpose"]
+
+VOCABULARY = (
+    "concomitant use with anticoagulants such as warfarin may increase the risk of serious "
+    "gastrointestinal bleeding monitor patients closely and adjust the dose renal hepatic "
+    "impairment elderly children under 12 years do not exceed 6 tablets in 24 hours stop use "
+    "and ask a doctor if pain gets worse or lasts more than 10 days allergic reaction hives "
+    "facial swelling asthma shock skin reddening rash blisters stomach ulcers heart attack stroke"
+).split()
+
+
+def label_text(size_kb: int, rng: random.Random) -> str:
+    """Pseudo-random label prose, so compression ratios are not flattered by repetition"""
+    words = []
+    length = 0
+    while length < size_kb * 1024:
+        word = rng.choice(VOCABULARY)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)
+
+
+def label_payload(section_kb: int = 12) -> dict:
+    """Drug search response with label sections of realistic length"""
+    rng = random.Random(0)
+    section = label_text(section_kb, rng)
+    return {
+        "brand_name": "Advil",
+        "generic_name": "IBUPROFEN",
+        "manufacturer": "Haleon US Holdings LLC",
+        "product_type": "HUMAN OTC DRUG",
+        "route": "ORAL",
+        "active_ingredients": "Ibuprofen 200 mg (NSAID)",
+        "purpose": "Pain reliever/fever reducer",
+        "warnings": section,
+        "dosage_administration": label_text(section_kb, rng),
+        "pregnancy_risk": label_text(section_kb // 4, rng),
+        "drug_interactions": label_text(section_kb, rng),
+    }
+
+
+def render_default(payload) -> bytes:
+    return JSONResponse(content=jsonable_encoder(payload)).body
+
+
+def render_orjson(payload) -> bytes:
+    return ORJSONResponse(content=jsonable_encoder(payload)).body
+
+
+def time_us(fn, payload, number: int = 2000) -> float:
+    return timeit.timeit(lambda: fn(payload), number=number) / number * 1e6
+
+
+def main():
+    payload = label_payload()
+    projected = project(payload, SUMMARY_FIELDS).body
+
+    default_body = render_default(payload)
+    orjson_body = render_orjson(payload)
+    assert json.loads(default_body) == json.loads(orjson_body)
+
+    print(f"{'serializer':<24}{'time (us)':>12}")
+    print(f"{'JSONResponse (before)':<24}{time_us(render_default, payload):>12.1f}")
+    print(f"{'ORJSONResponse (after)':<24}{time_us(render_orjson, payload):>12.1f}")
+    print()
+
+    sizes = [
+        ("full, identity (before)", len(default_body)),
+        ("full, gzip", len(compress(orjson_body, "gzip"))),
+    ]
+    if brotli is not None:
+        sizes.append(("full, brotli", len(compress(orjson_body, "br"))))
+        sizes.append(("full, brotli q5", len(compress(orjson_body, "br", brotli_quality=5))))
+    sizes.append(("?fields= summary card", len(projected)))
+
+    print(f"{'payload':<24}{'bytes':>12}")
+    for name, size in sizes:
+        print(f"{name:<24}{size:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import asyncio
+import socket
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api import drugs
+from app.main import app
+from app.services.cancellation import (
+    Deadline, DeadlineExceeded, call_with_deadline, cancellation_stats
+)
+from app.services.fda_service import FDAService
+
+client = TestClient(app)
+
+
+class HangingServer:
+    """Accepts connections, never answers, and records when the client hangs up"""
+
+    def __init__(self):
+        self.sock = socket.create_server(("127.0.0.1", 0))
+        self.url = f"http://127.0.0.1:{self.sock.getsockname()[1]}"
+        self.accepted = threading.Event()
+        self.closed = threading.Event()
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        conn, _ = self.sock.accept()
+        self.accepted.set()
+        with conn:
+            while conn.recv(4096):
+                pass
+        self.closed.set()
+
+    def close(self):
+        self.sock.close()
+
+
+@pytest.fixture
+def fda_server(monkeypatch):
+    server = HangingServer()
+    monkeypatch.setattr(FDAService, "BASE_URL", server.url)
+    monkeypatch.setattr(drugs.fda_service, "index", None)
+    monkeypatch.setattr(drugs.fda_service, "offline_only", False)
+    yield server
+    server.close()
+
+
+def test_call_with_deadline_keeps_the_calls_own_timeout():
+    async def own_timeout():
+        raise asyncio.TimeoutError()
+
+    before = cancellation_stats.cancelled["test"]
+    with pytest.raises(asyncio.TimeoutError) as excinfo:
+        asyncio.run(call_with_deadline(own_timeout(), Deadline(5), "test"))
+
+    assert not isinstance(excinfo.value, DeadlineExceeded)
+    assert cancellation_stats.cancelled["test"] == before
+
+
+@pytest.mark.parametrize("path", ["/api/drugs/interactions/aspirin", "/api/drugs/adverse-events/aspirin"])
+def test_drug_routes_enforce_deadline_and_close_connection(fda_server, monkeypatch, path):
+    monkeypatch.setattr(drugs, "LOOKUP_BUDGET", 0.3)
+    before = cancellation_stats.cancelled["fda"]
+
+    response = client.get(path)
+
+    assert response.status_code == 504
+    assert fda_server.accepted.is_set()
+    assert fda_server.closed.wait(2)
+    assert cancellation_stats.cancelled["fda"] == before + 1
+
+
+def test_probe_fda_cancellation_closes_connection(fda_server):
+    async def abandon():
+        deadline = Deadline(30)
+        task = asyncio.create_task(drugs._probe_fda(["ASPIRIN"], deadline))
+        await asyncio.to_thread(fda_server.accepted.wait, 2)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return deadline
+
+    deadline = asyncio.run(abandon())
+
+    assert fda_server.accepted.is_set()
+    # Closed straight away, not when the 10s probe timeout runs out
+    assert fda_server.closed.wait(1)
+    assert not deadline.in_flight
+    # The abandoned probe is neither a success nor a failure for the breaker
+    assert drugs.fda_breaker.snapshot()["consecutive_failures"] == 0
+    assert drugs.fda_breaker.state == "closed"
+
+
+def test_prescriptions_router_is_mounted():
+    paths = {route.path for route in app.routes}
+
+    assert "/api/prescriptions/process" in paths
@@ -0,0 +1,42 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.middleware.compression import CompressionMiddleware, choose_encoding, compress
+from benchmarks.bench_responses import label_payload
+
+app = FastAPI()
+app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
+
+@app.get("/label")
+async def label():
+    return label_payload()
+
+
+@app.get("/small")
+async def small():
+    return {"status": "ok"}
+
+
+client = TestClient(app)
+
+
+def test_choose_encoding():
+    assert choose_encoding("gzip, deflate, br") == "br"
+    assert choose_encoding("gzip, br;q=0") == "gzip"
+    assert choose_encoding("identity") is None
+
+
+def test_default_brotli_quality_beats_gzip():
+    response = client.get("/label", headers={"Accept-Encoding": "br"})
+
+    assert response.headers["content-encoding"] == "br"
+    body = response.content
+    assert len(compress(body, "br")) < len(compress(body, "gzip"))
+
+
+def test_small_responses_are_not_compressed():
+    response = client.get("/small", headers={"Accept-Encoding": "br"})
+
+    assert "content-encoding" not in response.headers
+    assert response.json() == {"status": "ok"}
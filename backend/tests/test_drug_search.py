@@ -0,0 +1,97 @@
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api import drugs
+from app.main import app
+from app.services.cancellation import Deadline
+from app.services.fda_index import FDALabelIndex
+from app.services.resilience import CircuitBreaker
+
+SAMPLE = Path(__file__).parent / "fixtures" / "drug-label-sample.json"
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def lookup_stats(monkeypatch):
+    stats = dict.fromkeys(drugs.lookup_stats, 0)
+    monkeypatch.setattr(drugs, "lookup_stats", stats)
+    return stats
+
+
+@pytest.fixture
+def offline_index(tmp_path, monkeypatch):
+    index = FDALabelIndex(str(tmp_path / "labels.db"))
+    index.ingest_file(str(SAMPLE))
+    monkeypatch.setattr(drugs.fda_service, "index", index)
+    yield index
+    index.close()
+
+
+def test_search_answers_from_offline_index(offline_index):
+    response = client.get("/api/drugs/search/advil")
+
+    assert response.status_code == 200
+    assert response.json()["brand_name"] == "Advil"
+    assert response.json()["generic_name"] == "IBUPROFEN"
+
+
+def test_search_runs_budgeted_race(monkeypatch, lookup_stats):
+    async def slow_fda(name_variations, deadline):
+        await asyncio.sleep(1)
+
+    async def llm(drug_name, deadline):
+        return {"brand_name": drug_name.title()}
+
+    monkeypatch.setattr(drugs, "_probe_fda", slow_fda)
+    monkeypatch.setattr(drugs, "_llm_lookup", llm)
+    monkeypatch.setattr(drugs, "HEDGE_DEFAULT_DELAY", 0.01)
+
+    response = client.get("/api/drugs/search/aspirin", params={"budget": 2})
+
+    assert response.status_code == 200
+    assert response.json()["brand_name"] == "Aspirin"
+    stats = client.get("/api/drugs/lookup-stats").json()["hedging"]
+    assert stats["hedged"] == 1
+    assert stats["llm_wins"] == 1
+
+
+def test_search_over_budget_returns_504(monkeypatch, lookup_stats):
+    async def hang(*args):
+        await asyncio.sleep(5)
+
+    monkeypatch.setattr(drugs, "_probe_fda", hang)
+    monkeypatch.setattr(drugs, "_llm_lookup", hang)
+    monkeypatch.setattr(drugs, "HEDGE_DEFAULT_DELAY", 0.01)
+
+    response = client.get("/api/drugs/search/aspirin", params={"budget": 0.2})
+
+    assert response.status_code == 504
+    assert lookup_stats["budget_exceeded"] == 1
+
+
+@pytest.mark.parametrize("error", [
+    ValueError("unexpected probe error"),
+    json.JSONDecodeError("Expecting value", "<html>", 0),
+])
+def test_failed_half_open_trial_releases_fda_breaker(monkeypatch, error):
+    breaker = CircuitBreaker("fda", failure_threshold=1, cooldown=0)
+    breaker.record_failure()
+    assert breaker.state == "half_open"
+
+    async def broken_probe(session, search):
+        raise error
+
+    monkeypatch.setattr(drugs, "fda_breaker", breaker)
+    monkeypatch.setattr(drugs, "_probe_label", broken_probe)
+
+    assert asyncio.run(drugs._probe_fda(["ASPIRIN"], Deadline(5))) is None
+
+    # Every trial ended as a failure instead of leaving the breaker stuck
+    assert not breaker.trial_in_flight
+    assert breaker.failures == 5
+    assert breaker.allow()
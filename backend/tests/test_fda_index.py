@@ -0,0 +1,134 @@
+import io
+import json
+from pathlib import Path
+
+import pytest
+
+from app.services.fda_index import FDALabelIndex, iter_label_file
+
+FIXTURES = Path(__file__).parent / "fixtures"
+SAMPLE = FIXTURES / "drug-label-sample.json"
+SAMPLE_ZIP = FIXTURES / "drug-label-sample.json.zip"
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = FDALabelIndex(str(tmp_path / "labels.db"))
+    yield index
+    index.close()
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64, 1 << 16])
+def test_iter_label_file_matches_json_load(chunk_size):
+    expected = json.loads(SAMPLE.read_text(encoding="utf-8"))
+    with open(SAMPLE, encoding="utf-8") as fp:
+        items = list(iter_label_file(fp, chunk_size=chunk_size))
+
+    assert items[0] == ("meta", expected["meta"])
+    assert [value for kind, value in items[1:]] == expected["results"]
+    assert all(kind == "result" for kind, _ in items[1:])
+
+
+@pytest.mark.parametrize("chunk_size", [1, 4])
+def test_iter_label_file_numbers_at_buffer_edge(chunk_size):
+    document = '{"results": [{"version": 12345}, {"version": 6.25e2}], "meta": {"total": 2}}'
+    items = list(iter_label_file(io.StringIO(document), chunk_size=chunk_size))
+
+    assert items == [
+        ("result", {"version": 12345}),
+        ("result", {"version": 625.0}),
+        ("meta", {"total": 2}),
+    ]
+
+
+def test_iter_label_file_rejects_truncated_input():
+    with pytest.raises(ValueError):
+        list(iter_label_file(io.StringIO('{"results": [{"set_id": "a"'), chunk_size=4))
+
+
+@pytest.mark.parametrize("path", [SAMPLE, SAMPLE_ZIP])
+def test_ingest_plain_and_zipped(index, path):
+    assert index.ingest_file(str(path), source="label") == 3
+
+    stats = index.stats()
+    assert stats["labels"] == 3
+    assert stats["datasets"][0]["last_updated"] == "2024-03-01"
+    assert index.is_ingested("label", "2024-03-01")
+    assert not index.is_ingested("label", "2024-04-01")
+
+
+@pytest.mark.parametrize("query, set_id", [
+    ("Advil", "advil-set"),
+    ("advil", "advil-set"),
+    ("ibuprofen", "advil-set"),
+    ("Warfarin Sodium", "coumadin-set"),
+    ("warfarin", "coumadin-set"),
+    ("0056-0176", "coumadin-set"),
+    ("50580-449", "tylenol-set"),
+])
+def test_search_by_brand_generic_and_ndc(index, query, set_id):
+    index.ingest_file(str(SAMPLE))
+
+    label = index.get_label(query)
+    assert label is not None
+    assert label["set_id"] == set_id
+
+
+def test_search_misses_and_odd_input(index):
+    index.ingest_file(str(SAMPLE))
+
+    assert index.get_label("metformin") is None
+    assert index.get_label("   ") is None
+    assert index.get_label('adv"il') is None
+
+
+def _write_release(path: Path, last_updated: str, results: list) -> str:
+    path.write_text(json.dumps({"meta": {"last_updated": last_updated}, "results": results}))
+    return str(path)
+
+
+def test_older_release_does_not_overwrite_newer_labels(index, tmp_path):
+    index.ingest_file(str(SAMPLE), source="label")
+    older = _write_release(tmp_path / "older.json", "2023-01-01", [
+        {
+            "set_id": "advil-set",
+            "effective_time": "20230101",
+            "warnings": ["Outdated warning text"],
+            "openfda": {"brand_name": ["Advil"], "generic_name": ["IBUPROFEN"]},
+        },
+        {
+            "set_id": "motrin-set",
+            "effective_time": "20230101",
+            "openfda": {"brand_name": ["Motrin"], "generic_name": ["IBUPROFEN"]},
+        },
+    ])
+
+    assert index.ingest_file(older, source="label") == 2
+
+    advil = index.get_label("advil")
+    assert advil["effective_time"] == "20240101"
+    assert advil["warnings"][0].startswith("Stomach bleeding warning")
+    # Labels missing from the newer release are still added
+    assert index.get_label("motrin")["set_id"] == "motrin-set"
+    assert index.stats()["labels"] == 4
+
+
+def test_newer_release_replaces_label_and_reindexes_names(index, tmp_path):
+    index.ingest_file(str(SAMPLE))
+    newer = _write_release(tmp_path / "newer.json", "2024-06-01", [
+        {
+            "set_id": "tylenol-set",
+            "effective_time": "20240601",
+            "warnings": ["Updated liver warning"],
+            "openfda": {"brand_name": ["Tylenol Extra Strength"], "generic_name": ["ACETAMINOPHEN"]},
+        },
+    ])
+
+    index.ingest_file(newer)
+
+    label = index.get_label("tylenol extra strength")
+    assert label["effective_time"] == "20240601"
+    assert label["warnings"] == ["Updated liver warning"]
+    # The old NDC is gone from the FTS index along with the old row
+    assert index.get_label("50580-449") is None
+    assert index.stats()["labels"] == 3
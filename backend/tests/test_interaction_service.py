@@ -0,0 +1,96 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from app.services.fda_index import FDALabelIndex
+from app.services.fda_service import FDAService
+from app.services.interaction_service import InteractionService, _lookup_names
+
+SAMPLE = Path(__file__).parent / "fixtures" / "drug-label-sample.json"
+
+
+@pytest.fixture
+def service(tmp_path):
+    index = FDALabelIndex(str(tmp_path / "labels.db"))
+    index.ingest_file(str(SAMPLE))
+    yield InteractionService(FDAService(index=index, offline_only=True))
+    index.close()
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("Advil", ["advil"]),
+    ("Tab. Advil", ["advil"]),
+    ("Tab. Advil 200 mg", ["advil"]),
+    ("Coumadin 5mg tablet", ["coumadin"]),
+    ("Advil Liqui-Gels", ["advil liqui gels", "advil"]),
+    ("Tab. 500", ["Tab. 500"]),
+])
+def test_lookup_names(name, expected):
+    assert [lookup_name for lookup_name, _ in _lookup_names(name)] == expected
+
+
+@pytest.mark.parametrize("names", [
+    ["Advil", "Coumadin"],
+    ["Tab. Advil", "Coumadin"],
+    ["Tab. Advil 200 mg", "Tab. Coumadin 5 MG"],
+    ["ADVIL 200MG", "Coumadin 2.5mg"],
+    ["Advil Liqui-Gels", "Coumadin"],
+])
+def test_check_prescription_resolves_prescribed_names(service, names):
+    result = asyncio.run(service.check_prescription(names))
+
+    assert result["unresolved"] == []
+    assert result["matrix"] == [[False, True], [True, False]]
+    [interaction] = result["interactions"]
+    assert (interaction["drug_a"], interaction["drug_b"]) == tuple(names)
+    assert interaction["evidence"][0]["source"] == names[1]
+    assert interaction["evidence"][0]["matched_term"] == "ibuprofen"
+
+
+def test_check_prescription_reports_unknown_drugs(service):
+    result = asyncio.run(service.check_prescription(["Tab. Advil", "Cap. Unknownium 10 mg"]))
+
+    assert result["unresolved"] == ["Cap. Unknownium 10 mg"]
+    assert result["interactions"] == []
+
+
+@pytest.mark.parametrize("other", ["Liver Tonic syrup", "Liver Care capsules", "Stomach Liver Vitamin"])
+def test_ordinary_words_of_a_name_are_not_synonyms(service, other):
+    # Tylenol's label has a "Liver warning"
+    result = asyncio.run(service.check_prescription(["Tylenol", other]))
+
+    assert result["matrix"] == [[False, False], [False, False]]
+    assert result["interactions"] == []
+    assert result["unresolved"] == [other]
+
+
+class StubFDAService:
+    """Serves fixed labels by exact lookup name"""
+
+    def __init__(self, labels):
+        self.labels = labels
+        self.lookups = []
+
+    async def get_label(self, name, session=None):
+        self.lookups.append(name)
+        return self.labels.get(name)
+
+
+COUMADIN = {"openfda": {"brand_name": ["Coumadin"], "generic_name": ["WARFARIN SODIUM"]}}
+ADVIL = {"openfda": {"brand_name": ["Advil"], "generic_name": ["IBUPROFEN"]}}
+
+
+def test_first_word_fallback_rejects_unrelated_label():
+    # A loose search for "stomach" returning a label not named by it
+    fda_service = StubFDAService({"stomach": COUMADIN})
+    service = InteractionService(fda_service)
+
+    assert asyncio.run(service.fetch_label("Stomach Relief syrup", None)) is None
+    assert fda_service.lookups == ["stomach relief", "stomach"]
+
+
+def test_first_word_fallback_accepts_label_named_by_it():
+    service = InteractionService(StubFDAService({"advil": ADVIL}))
+
+    assert asyncio.run(service.fetch_label("Advil Liqui-Gels", None)) is ADVIL
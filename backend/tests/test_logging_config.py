@@ -0,0 +1,156 @@
+import json
+import logging
+import re
+from contextlib import contextmanager
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import logging_config
+from app.middleware.request_id import RequestIdMiddleware
+
+
+@pytest.fixture
+def configure_logging(monkeypatch, capsys):
+    """
+    Run setup_logging with the given environment and hand back the JSON
+    records it wrote once the listener has drained its queue
+    """
+
+    @contextmanager
+    def configure(**env):
+        for name in ("LOG_LEVEL", "LOG_LEVELS", "LOG_SAMPLE_RATE"):
+            monkeypatch.delenv(name, raising=False)
+        for name, value in env.items():
+            monkeypatch.setenv(name, value)
+        monkeypatch.setattr(logging_config, "_listener", None)
+        monkeypatch.setattr(logging_config.atexit, "register", lambda func: None)
+
+        root = logging.getLogger()
+        saved_handlers, saved_level = root.handlers[:], root.level
+        overridden = list(logging_config._parse_levels(env.get("LOG_LEVELS", "")))
+        capsys.readouterr()
+        records = []
+        try:
+            logging_config.setup_logging()
+            yield records
+        finally:
+            logging_config._listener.stop()
+            root.handlers, root.level = saved_handlers, saved_level
+            for name in overridden:
+                logging.getLogger(name).setLevel(logging.NOTSET)
+            records.extend(json.loads(line) for line in capsys.readouterr().out.splitlines())
+
+    return configure
+
+
+def test_records_are_json_lines(configure_logging):
+    logger = logging.getLogger("tests.format")
+
+    with configure_logging() as records:
+        logger.info("Looked up %s", "aspirin", extra={"drug": "aspirin", "attempt": 2})
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            logger.exception("Lookup failed")
+
+    info, error = records
+    assert info["level"] == "INFO"
+    assert info["logger"] == "tests.format"
+    assert info["message"] == "Looked up aspirin"
+    assert (info["drug"], info["attempt"]) == ("aspirin", 2)
+    assert info["request_id"] is None
+    assert error["level"] == "ERROR"
+    assert "ZeroDivisionError" in error["exception"]
+
+
+@pytest.mark.parametrize("field", sorted(logging_config.REDACTED_FIELDS))
+def test_sensitive_extras_are_redacted(configure_logging, field):
+    secret = "Patient: R. Kumar, Tab. Warfarin 5 mg"
+
+    with configure_logging() as records:
+        logging.getLogger("tests.redaction").warning("Gemini response", extra={field: secret})
+
+    [record] = records
+    assert record[field] == f"[REDACTED len={len(secret)}]"
+    assert "Kumar" not in json.dumps(record)
+
+
+def test_redaction_keeps_length_of_lists(configure_logging):
+    with configure_logging() as records:
+        logging.getLogger("tests.redaction").info("Parsed", extra={"medicines": [{"name": "A"}, {"name": "B"}]})
+
+    assert records[0]["medicines"] == "[REDACTED len=2]"
+
+
+def _request_id_app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(RequestIdMiddleware)
+
+    @app.get("/analyze")
+    async def analyze():
+        logging.getLogger("tests.request_id").info("Analyzing", extra={"raw_response": "{\"medicines\": []}"})
+        return {"status": "ok"}
+
+    return app
+
+
+def test_records_carry_request_id_header(configure_logging):
+    client = TestClient(_request_id_app())
+
+    with configure_logging() as records:
+        response = client.get("/analyze", headers={"X-Request-ID": "req-1234"})
+
+    assert response.headers["X-Request-ID"] == "req-1234"
+    [record] = [r for r in records if r["logger"] == "tests.request_id"]
+    assert record["request_id"] == "req-1234"
+    assert record["raw_response"] == "[REDACTED len=17]"
+
+
+def test_request_id_is_generated_when_missing(configure_logging):
+    client = TestClient(_request_id_app())
+
+    with configure_logging() as records:
+        response = client.get("/analyze")
+
+    request_id = response.headers["X-Request-ID"]
+    assert re.fullmatch(r"[0-9a-f]{32}", request_id)
+    assert [r["request_id"] for r in records if r["logger"] == "tests.request_id"] == [request_id]
+    # Reset once the request is done
+    assert logging_config.request_id_var.get() is None
+
+
+def test_sampling_never_drops_warnings(configure_logging):
+    logger = logging.getLogger("tests.sampling")
+
+    with configure_logging(LOG_SAMPLE_RATE="0") as records:
+        for _ in range(50):
+            logger.info("Cache hit")
+        logger.warning("FDA breaker opened")
+        logger.error("Gemini failed")
+
+    assert [r["message"] for r in records] == ["FDA breaker opened", "Gemini failed"]
+
+
+def test_sampling_keeps_a_fraction_of_info(configure_logging, monkeypatch):
+    draws = iter([0.1, 0.9, 0.2, 0.8])
+    monkeypatch.setattr(logging_config.random, "random", lambda: next(draws))
+
+    with configure_logging(LOG_SAMPLE_RATE="0.5") as records:
+        for n in range(4):
+            logging.getLogger("tests.sampling").info("Record %d", n)
+
+    assert [r["message"] for r in records] == ["Record 0", "Record 2"]
+
+
+def test_log_levels_override_per_module(configure_logging):
+    with configure_logging(LOG_LEVEL="INFO", LOG_LEVELS="tests.quiet=WARNING, tests.verbose=debug") as records:
+        logging.getLogger("tests.quiet").info("quiet info")
+        logging.getLogger("tests.quiet.child").info("quiet child info")
+        logging.getLogger("tests.quiet").warning("quiet warning")
+        logging.getLogger("tests.verbose").debug("verbose debug")
+        logging.getLogger("tests.other").debug("other debug")
+        logging.getLogger("tests.other").info("other info")
+
+    assert [r["message"] for r in records] == ["quiet warning", "verbose debug", "other info"]
@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+
+from app.services.cancellation import DeadlineExceeded
+from app.services.long_document import (
+    PAGE_BREAK, IncompleteAnalysis, analyze_in_chunks, merge_medicines, select_chunks, split_chunks
+)
+
+PAGES = [
+    "Patient: R. Kumar\nAge: 64\nAdmitted with chest pain.\n",
+    "Investigations\nHb 13.2 g/dl\nTroponin I 0.02 ng/ml\n",
+    "Discharge medications\nTab. Aspirin 75 mg OD\nTab. Atorvastatin 40 mg at night\n",
+    "Advice\nWalk daily. Review after 2 weeks.\n",
+    "Rx\nTab. Metoprolol 25 mg BD\nTab. Aspirin 75mg OD after food\n",
+]
+DOCUMENT = ("\n" + PAGE_BREAK).join(PAGES)
+
+
+def test_split_and_select_medication_chunks():
+    chunks = split_chunks(DOCUMENT, max_chars=80)
+
+    assert len(chunks) == 5
+    # The first chunk for patient details, then the two medication pages
+    assert select_chunks(chunks) == [0, 2, 4]
+
+
+def test_merge_medicines_deduplicates_by_name_and_dosage():
+    merged = merge_medicines([
+        {"medicines": [{"name": "Tab. Aspirin", "dosage": "75 mg", "confidence": 0.6}]},
+        {"medicines": [
+            {"name": "ASPIRIN", "dosage": "75mg", "frequency": "OD", "confidence": 0.9},
+            {"name": "Metoprolol", "dosage": "25 mg"},
+        ]},
+    ])
+
+    assert [m["name"] for m in merged] == ["ASPIRIN", "Metoprolol"]
+    assert merged[0]["frequency"] == "OD"
+
+
+def _analyzer(fail_on=(), raise_with=RuntimeError("Gemini quota exceeded")):
+    calls = []
+
+    async def analyze(chunk):
+        calls.append(chunk)
+        if any(marker in chunk for marker in fail_on):
+            raise raise_with
+        await asyncio.sleep(0)
+        return {"medicines": [{"name": line} for line in chunk.splitlines() if line.startswith("Tab.")]}
+
+    return analyze, calls
+
+
+def test_analyze_in_chunks_merges_selected_chunks(monkeypatch):
+    monkeypatch.setattr("app.services.long_document.split_chunks", lambda text: split_chunks(text, 80))
+    analyze, calls = _analyzer()
+
+    result = asyncio.run(analyze_in_chunks(DOCUMENT, analyze))
+
+    assert len(calls) == 3
+    assert {m["name"] for m in result["medicines"]} == {
+        "Tab. Aspirin 75 mg OD", "Tab. Atorvastatin 40 mg at night",
+        "Tab. Metoprolol 25 mg BD", "Tab. Aspirin 75mg OD after food",
+    }
+
+
+def test_failed_chunk_fails_the_whole_analysis(monkeypatch):
+    monkeypatch.setattr("app.services.long_document.split_chunks", lambda text: split_chunks(text, 80))
+    analyze, _ = _analyzer(fail_on=["Metoprolol"])
+
+    with pytest.raises(IncompleteAnalysis) as excinfo:
+        asyncio.run(analyze_in_chunks(DOCUMENT, analyze))
+
+    assert excinfo.value.failed == [4]
+    assert excinfo.value.total == 5
+    assert "chunk(s) 5 of 5" in str(excinfo.value)
+    assert "Gemini quota exceeded" in str(excinfo.value)
+
+
+def test_failed_chunk_cancels_the_other_chunk_calls(monkeypatch):
+    monkeypatch.setattr("app.services.long_document.split_chunks", lambda text: split_chunks(text, 80))
+    cancelled = []
+
+    async def analyze(chunk):
+        if "Metoprolol" in chunk:
+            raise RuntimeError("Gemini quota exceeded")
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(chunk)
+            raise
+
+    with pytest.raises(IncompleteAnalysis):
+        asyncio.run(asyncio.wait_for(analyze_in_chunks(DOCUMENT, analyze), 2))
+
+    assert len(cancelled) == 2
+
+
+def test_deadline_is_raised_as_is(monkeypatch):
+    monkeypatch.setattr("app.services.long_document.split_chunks", lambda text: split_chunks(text, 80))
+    analyze, _ = _analyzer(fail_on=["Aspirin"], raise_with=DeadlineExceeded("too slow"))
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(analyze_in_chunks(DOCUMENT, analyze))
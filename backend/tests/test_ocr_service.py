@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from app.services import ocr_service
+from app.services.ocr_service import EscalatingOCREngine, OCREngine, OCRResult, get_ocr_engine
+
+
+class FixedEngine(OCREngine):
+    def __init__(self, name, text="", confidence=None, error=None):
+        self.name = name
+        self.result = OCRResult(text, confidence, name)
+        self.error = error
+        self.calls = 0
+
+    async def recognize(self, content, deadline=None):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        return self.result
+
+
+@pytest.fixture(autouse=True)
+def ocr_stats(monkeypatch):
+    stats = dict.fromkeys(ocr_service.ocr_stats, 0)
+    monkeypatch.setattr(ocr_service, "ocr_stats", stats)
+    return stats
+
+
+def test_incomplete_engine_fails_on_creation():
+    class NoRecognize(OCREngine):
+        name = "broken"
+
+    with pytest.raises(TypeError):
+        NoRecognize()
+
+
+def test_get_ocr_engine():
+    assert get_ocr_engine("vision").name == "vision"
+    assert get_ocr_engine("local").name == "local"
+    assert get_ocr_engine("auto").name == "auto"
+    with pytest.raises(ValueError):
+        get_ocr_engine("onnx")
+
+
+def test_confident_local_result_is_kept(ocr_stats):
+    local = FixedEngine("local", "Tab. Aspirin 75 mg", 91.0)
+    remote = FixedEngine("vision", "unused")
+    engine = EscalatingOCREngine(local, remote, min_confidence=80)
+
+    result = asyncio.run(engine.recognize(b"image"))
+
+    assert result.engine == "local"
+    assert remote.calls == 0
+    assert ocr_stats["escalated"] == 0
+
+
+@pytest.mark.parametrize("local", [
+    FixedEngine("local", "Tab. Aspir1n", 42.0),
+    FixedEngine("local", "   ", 95.0),
+    FixedEngine("local", error=RuntimeError("Tesseract OCR failed")),
+])
+def test_unsure_or_failed_local_result_escalates(ocr_stats, local):
+    remote = FixedEngine("vision", "Tab. Aspirin 75 mg")
+    engine = EscalatingOCREngine(local, remote, min_confidence=80)
+
+    result = asyncio.run(engine.recognize(b"image"))
+
+    assert result.engine == "vision"
+    assert result.text == "Tab. Aspirin 75 mg"
+    assert ocr_stats["escalated"] == 1
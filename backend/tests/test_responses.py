@@ -0,0 +1,72 @@
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api import drugs
+from app.api.drugs import DrugSearchResponse
+from app.api.responses import field_projection, project
+from app.main import app
+from app.services.fda_index import FDALabelIndex
+
+SAMPLE = Path(__file__).parent / "fixtures" / "drug-label-sample.json"
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def offline_index(tmp_path, monkeypatch):
+    index = FDALabelIndex(str(tmp_path / "labels.db"))
+    index.ingest_file(str(SAMPLE))
+    monkeypatch.setattr(drugs.fda_service, "index", index)
+    yield index
+    index.close()
+
+
+def test_field_projection_parsing():
+    assert field_projection(None) is None
+    assert field_projection("") is None
+    assert field_projection(" name, ,state ") == ["name", "state"]
+
+
+def test_project_without_fields_returns_data_unchanged():
+    data = [{"a": 1, "b": 2}]
+
+    assert project(data, None) is data
+
+
+def test_store_search_list_is_projected():
+    response = client.get("/api/stores/search", params={"state": "Maharashtra", "fields": "name,pin_code"})
+
+    assert response.status_code == 200
+    stores = response.json()
+    assert stores
+    assert all(set(store) == {"name", "pin_code"} for store in stores)
+
+
+def test_store_search_ignores_unknown_fields():
+    response = client.get("/api/stores/search", params={"state": "Maharashtra", "fields": "name,nonexistent"})
+
+    assert all(set(store) == {"name"} for store in response.json())
+
+
+def test_store_search_without_fields_is_complete():
+    response = client.get("/api/stores/search", params={"state": "Maharashtra"})
+
+    assert {"name", "pin_code", "address", "kendra_code"} <= set(response.json()[0])
+
+
+def test_drug_search_projection_bypasses_response_model(offline_index):
+    response = client.get("/api/drugs/search/advil", params={"fields": "brand_name"})
+
+    assert response.status_code == 200
+    # Not the other DrugSearchResponse fields filled back in as nulls
+    assert response.json() == {"brand_name": "Advil"}
+
+
+def test_drug_search_without_fields_follows_response_model(offline_index):
+    response = client.get("/api/drugs/search/advil")
+
+    assert response.status_code == 200
+    assert set(response.json()) == set(DrugSearchResponse.__fields__)
+    assert response.json()["generic_name"] == "IBUPROFEN"